@@ -0,0 +1,16 @@
+import os
+import secrets
+from fastapi import HTTPException, Request
+
+# Admin endpoints accept X-Admin-Token when ROCK_ADMIN_TOKEN is set,
+# otherwise they only answer requests coming from this machine.
+ADMIN_TOKEN = os.environ.get("ROCK_ADMIN_TOKEN")
+LOCAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+def require_admin(request: Request):
+    if ADMIN_TOKEN:
+        token = request.headers.get("x-admin-token", "")
+        if not secrets.compare_digest(token, ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="Admin token required.")
+    elif request.client is None or request.client.host not in LOCAL_HOSTS:
+        raise HTTPException(status_code=403, detail="Admin endpoints are only available locally.")
@@ -0,0 +1,163 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+
+TUNE_DIR = "autotune"
+DEFAULT_BATCHES = (1, 2, 4, 8, 16, 32)
+
+
+def apply_threads(threads):
+    """Set MindSpore's CPU intra-op thread count. Must run before the model is built."""
+    import mindspore as ms
+    try:
+        from mindspore.device_context.cpu.op_tuning import threads_num
+        threads_num(threads)
+    except (ImportError, AttributeError):
+        ms.set_context(runtime_num_threads=threads)
+
+
+def thread_candidates():
+    cores = os.cpu_count() or 1
+    candidates = {1, 2, 4, cores // 2, cores}
+    return sorted(c for c in candidates if 1 <= c <= cores)
+
+
+def _ckpt_key(ckpt_path):
+    h = hashlib.sha1()
+    with open(ckpt_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def result_path(ckpt_path):
+    host = socket.gethostname().replace(os.sep, "_")
+    return os.path.join(TUNE_DIR, f"{host}-{_ckpt_key(ckpt_path)}.json")
+
+
+def load_result(ckpt_path):
+    path = result_path(ckpt_path)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# --- Worker: runs in a fresh process so the thread setting takes effect ---
+def benchmark_worker(ckpt_path, threads, batches, seconds):
+    apply_threads(threads)
+    import numpy as np
+    import mindspore as ms
+    from mindspore import Tensor
+    from mindspore.train.serialization import load_checkpoint, load_param_into_net
+    import mobilenet_ms as mn
+
+    if ckpt_path.endswith(".mindir"):
+        net = ms.nn.GraphCell(ms.load(ckpt_path))
+    else:
+        net = mn.mobilenet_v2_for_checkpoint(12, ckpt_path)
+        load_param_into_net(net, load_checkpoint(ckpt_path))
+    net.set_train(False)
+
+    results = []
+    for batch in batches:
+        x = Tensor(np.random.rand(batch, 3, 224, 224).astype(np.float32))
+        try:
+            for _ in range(3):
+                net(x).asnumpy()
+        except Exception as e:
+            # e.g. a MindIR exported with a fixed batch dimension
+            results.append({"batch_size": batch, "error": str(e)})
+            continue
+        times = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline or len(times) < 5:
+            start = time.perf_counter()
+            net(x).asnumpy()
+            times.append(time.perf_counter() - start)
+        times = np.array(times)
+        results.append({
+            "batch_size": batch,
+            "latency_ms_p50": float(np.percentile(times, 50) * 1000),
+            "latency_ms_p95": float(np.percentile(times, 95) * 1000),
+            "images_per_sec": float(batch * len(times) / times.sum()),
+        })
+    return results
+
+
+# --- Search ---
+def tune(ckpt_path, latency_target_ms=100.0, batches=DEFAULT_BATCHES, threads=None, seconds=2.0):
+    """Benchmark every (threads, batch) pair and keep the fastest one within the latency target."""
+    threads = threads or thread_candidates()
+    here = os.path.dirname(os.path.abspath(__file__))
+    trials = []
+    for n in threads:
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--ckpt", ckpt_path,
+               "--threads", str(n), "--batches", ",".join(map(str, batches)), "--seconds", str(seconds)]
+        out = subprocess.run(cmd, cwd=here, capture_output=True, text=True)
+        if out.returncode != 0:
+            trials.append({"threads": n, "error": out.stderr.strip().splitlines()[-1:] or ["failed"]})
+            continue
+        for r in json.loads(out.stdout.strip().splitlines()[-1]):
+            trials.append({"threads": n, **r})
+        print(f"threads={n}: done")
+
+    ok = [t for t in trials if "error" not in t]
+    within = [t for t in ok if t["latency_ms_p95"] <= latency_target_ms]
+    # if nothing meets the target, fall back to the lowest-latency configuration
+    best = max(within, key=lambda t: t["images_per_sec"]) if within else \
+        min(ok, key=lambda t: t["latency_ms_p95"], default=None)
+
+    result = {
+        "host": socket.gethostname(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "checkpoint": ckpt_path,
+        "latency_target_ms": latency_target_ms,
+        "tuned_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "met_target": bool(within),
+        "best": best,
+        "trials": trials,
+    }
+    os.makedirs(TUNE_DIR, exist_ok=True)
+    with open(result_path(ckpt_path), "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+def load_or_tune(ckpt_path, latency_target_ms=100.0, force=False):
+    if not force:
+        result = load_result(ckpt_path)
+        if result is not None and result.get("latency_target_ms") == latency_target_ms:
+            return result
+    return tune(ckpt_path, latency_target_ms)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the best batch size and thread count on this host.")
+    parser.add_argument("--ckpt", default="ckpt/mobilenet_v2-25_74.ckpt")
+    parser.add_argument("--latency-target", type=float, default=100.0, help="p95 batch latency limit in ms")
+    parser.add_argument("--threads", default=None, help="comma-separated thread counts to try")
+    parser.add_argument("--batches", default=",".join(map(str, DEFAULT_BATCHES)))
+    parser.add_argument("--seconds", type=float, default=2.0, help="measurement time per configuration")
+    parser.add_argument("--force", action="store_true", help="ignore a saved result")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    batches = [int(b) for b in args.batches.split(",")]
+    if args.worker:
+        print(json.dumps(benchmark_worker(args.ckpt, int(args.threads), batches, args.seconds)))
+    else:
+        threads = [int(t) for t in args.threads.split(",")] if args.threads else None
+        if args.force or threads:
+            result = tune(args.ckpt, args.latency_target, batches, threads, args.seconds)
+        else:
+            result = load_or_tune(args.ckpt, args.latency_target)
+        print(json.dumps(result["best"], indent=2))
+        print(f"Saved to {result_path(args.ckpt)}")
@@ -1,12 +1,29 @@
-from fastapi import FastAPI, File, UploadFile, WebSocket, WebSocketDisconnect, Form
+from fastapi import FastAPI, File, UploadFile, WebSocket, WebSocketDisconnect, Form, Request, Depends
+from fastapi.responses import PlainTextResponse, Response, JSONResponse
 import mindspore as ms
-from mindspore import Tensor, ops
+from mindspore import Tensor, ops, nn
 from mindspore.train.serialization import load_checkpoint, load_param_into_net
-import json, base64, io
-from PIL import Image
+import json, base64
 import numpy as np
 import mobilenet_ms as mn
+import embedding_index as ei
+from preprocess import preprocess_array
+import stream as st
+import scheduler as sc
+import pipeline as pl
+import shadow as sh
+import heads as hd
+import explain as ex
+import memory as mem
+import tiling
+import autotune as at
+import profiler
+from admin import require_admin
+import asyncio
+import threading
+import time
 import os
+from typing import List
 
 app = FastAPI()
 
@@ -21,57 +38,580 @@ rock_classes = [
 # Initialize global variables
 net = None
 model = None
-current_ckpt = "ckpt/mobilenet_v2-25_74.ckpt"
+current_ckpt = os.environ.get("ROCK_MODEL", "ckpt/mobilenet_v2-25_74.ckpt")
+index_dir = "index/rocks_train"
+embedding_index = None
+inference_lock = threading.Lock()
+# Stage sizes: decode worker processes (0 = decode inline) and inference threads
+decode_workers = int(os.environ.get("ROCK_DECODE_WORKERS", "0"))
+inference_workers = int(os.environ.get("ROCK_INFERENCE_WORKERS", "1"))
+scheduler = sc.InferenceScheduler(workers=inference_workers)
+decode_pipeline = None
+shadow = None
+# Backbone shared by every loaded checkpoint fine-tuned from the same base
+shared = None
+# Feature maps kept only for predictions that asked for an explanation
+activations = ex.ActivationCache()
+# Optional RSS limit: "shed" refuses new predictions while over it, "recycle" restarts the worker
+memory_limit_mb = float(os.environ.get("ROCK_MEMORY_LIMIT_MB", "0")) or None
+memory_action = os.environ.get("ROCK_MEMORY_ACTION", "shed")
+watchdog = None
+allocations = mem.AllocationTracker()
+autotune_result = None
+# False once a MindIR graph has rejected a batch (exported with a fixed batch of 1)
+graph_batching = True
 
 def load_model(ckpt_path):
-    global net, model, current_ckpt
+    global net, model, current_ckpt, shared, graph_batching
     print(f"Loading model from: {ckpt_path}")
-    param_dict = load_checkpoint(ckpt_path)
-    net = mn.mobilenet_v2(num_class)
-    load_param_into_net(net, param_dict)
-    model = ms.Model(net)
-    current_ckpt = ckpt_path
+    new_shared = None
+    if ckpt_path.endswith(".mindir"):
+        # compiled graph from export_mindir.py: no Python cell graph to build
+        new_net = nn.GraphCell(ms.load(ckpt_path))
+    else:
+        param_dict = load_checkpoint(ckpt_path)
+        if shared is not None and shared.matches(ckpt_path, param_dict):
+            # same backbone weights: keep it resident and swap the classifier head only
+            classes = param_dict[shared.dense_names[0]].shape[0]
+            if classes != num_class:
+                raise ValueError(f"Head has {classes} classes, serving needs {num_class}.")
+            # always rebuilt from the file just read: the checkpoint may have been retrained in place
+            with inference_lock:
+                head = shared.attach(ckpt_path, param_dict, rock_classes)
+            print("Backbone unchanged, swapping the classifier head only")
+            new_net = mn.MobileNetV2Combine(shared.backbone, head)
+            new_shared = shared
+        else:
+            new_net = mn.mobilenet_v2_for_checkpoint(num_class, ckpt_path)
+            load_param_into_net(new_net, param_dict)
+            new_shared = hd.SharedBackbone(new_net, ckpt_path, param_dict, rock_classes)
+    # swap under the lock so worker threads never see a half-loaded model
+    with inference_lock:
+        net = new_net
+        model = ms.Model(net)
+        current_ckpt = ckpt_path
+        shared = new_shared
+        graph_batching = True
+
+def load_index(path):
+    global embedding_index
+    if os.path.isfile(os.path.join(path, "meta.json")):
+        print(f"Loading embedding index from: {path}")
+        embedding_index = ei.EmbeddingIndex.load(path)
+
+def configure_runtime(ckpt_path):
+    # Apply the tuned thread count before any network is built; tune first if ROCK_AUTOTUNE=1
+    global autotune_result
+    if not os.path.isfile(ckpt_path):
+        return
+    if os.environ.get("ROCK_AUTOTUNE") == "1":
+        autotune_result = at.load_or_tune(ckpt_path, float(os.environ.get("ROCK_LATENCY_TARGET_MS", "100")))
+    else:
+        autotune_result = at.load_result(ckpt_path)
+    if autotune_result and autotune_result.get("best"):
+        best = autotune_result["best"]
+        print(f"Using tuned config: {best['threads']} threads, batch size {best['batch_size']}")
+        at.apply_threads(best["threads"])
+
+def tuned_batch_size(default=16):
+    if autotune_result and autotune_result.get("best"):
+        return autotune_result["best"]["batch_size"]
+    return default
 
 # Load default model initially
+configure_runtime(current_ckpt)
 load_model(current_ckpt)
+load_index(index_dir)
 
 # --- Preprocessing ---
 def preprocess_image(image_bytes):
-    img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-    img = img.resize((224, 224))
-    img = np.array(img) / 255.0
-    mean = np.array([0.485, 0.456, 0.406])
-    std = np.array([0.229, 0.224, 0.225])
-    img = (img - mean) / std
-    img = img.transpose(2, 0, 1)
-    img = img[np.newaxis, ...]
-    return Tensor(img, ms.float32)
+    return Tensor(preprocess_array(image_bytes), ms.float32)
+
+# --- Forward pass ---
+def extract_features(input_data):
+    # Split the forward pass so the pooled embedding is available alongside the logits
+    with inference_lock:
+        net.set_train(False)
+        features = net.head.head(net.backbone(input_data))
+        output = net.head.dense(features)
+    return features, output
+
+def forward_probabilities(input_array):
+    # Called from worker threads, so forward passes are serialized on the shared net
+    start = time.perf_counter()
+    # shares memory with input_array (a shared-memory ring slot when decoding in workers); no copy
+    input_data = ms.from_numpy(input_array)
+    with inference_lock:
+        net.set_train(False)
+        output = net(input_data)
+    probabilities = ops.Softmax()(output).asnumpy()[0]
+    if shadow is not None:
+        shadow.offer(input_array, probabilities, (time.perf_counter() - start) * 1000)
+    return probabilities
+
+def forward_explainable(input_array):
+    # Only used when an explanation is requested: keeps the final feature map for /explain
+    input_data = Tensor(input_array, ms.float32)
+    with inference_lock:
+        net.set_train(False)
+        feature_map = net.backbone(input_data)
+        output = net.head(feature_map)
+        dense = net.head.dense
+    probabilities = ops.Softmax()(output).asnumpy()[0]
+    request_id = activations.put(feature_map.asnumpy()[0], activations.dense_weights(dense),
+                                 probabilities, rock_classes)
+    return probabilities, request_id
+
+def classify_probabilities(image_bytes):
+    return forward_probabilities(preprocess_array(image_bytes))
+
+def classify_slot(slot):
+    # The tensor is read straight from the shared-memory ring filled by a decode worker
+    try:
+        with decode_pipeline.inference_timer():
+            return forward_probabilities(decode_pipeline.view(slot))
+    finally:
+        decode_pipeline.release(slot)
+
+async def classify(image_bytes, priority="normal", client=None, deadline_ms=None):
+    if decode_pipeline is None:
+        return await scheduler.submit(classify_probabilities, image_bytes, priority=priority,
+                                      client=client, deadline_ms=deadline_ms)
+    # reject a bad priority before a ring slot is taken: on_drop only covers jobs that were queued
+    scheduler.check_priority(priority)
+    slot = await decode_pipeline.decode(image_bytes)
+    return await scheduler.submit(classify_slot, slot, priority=priority, client=client,
+                                  deadline_ms=deadline_ms, on_drop=lambda: decode_pipeline.release(slot))
+
+def forward_heads(input_array, names=None):
+    # One backbone pass, every requested head applied to the pooled features
+    with inference_lock:
+        shared.backbone.set_train(False)
+        return shared.predict(Tensor(input_array, ms.float32), names)
+
+def classify_heads(image_bytes, names=None):
+    return forward_heads(preprocess_array(image_bytes), names)
+
+def classify_explainable_bytes(image_bytes):
+    return forward_explainable(preprocess_array(image_bytes))
+
+async def classify_explainable(image_bytes, priority="normal", client=None, deadline_ms=None):
+    # decoded on the worker, like classify_probabilities, so the deadline check comes first
+    return await scheduler.submit(classify_explainable_bytes, image_bytes, priority=priority,
+                                  client=client, deadline_ms=deadline_ms)
+
+def forward_batch(batch):
+    global graph_batching
+    if len(batch) > 1 and not graph_batching:
+        return np.concatenate([forward_batch(batch[i:i + 1]) for i in range(len(batch))])
+    try:
+        with inference_lock:
+            net.set_train(False)
+            output = net(Tensor(batch, ms.float32))
+    except (RuntimeError, ValueError):
+        if len(batch) == 1 or not isinstance(net, nn.GraphCell):
+            raise
+        # a MindIR exported with a fixed batch of 1 (export_mindir.py --fixed-batch): one image at a time
+        graph_batching = False
+        return forward_batch(batch)
+    return ops.Softmax()(output).asnumpy()
+
+def classify_batch(images):
+    # Bad images get an error entry instead of failing the whole batch
+    probabilities, arrays, rows = [None] * len(images), [], []
+    for i, image_bytes in enumerate(images):
+        try:
+            arrays.append(preprocess_array(image_bytes))
+            rows.append(i)
+        except Exception as e:
+            probabilities[i] = f"Invalid image: {e}"
+    batch_size = tuned_batch_size()
+    for start in range(0, len(arrays), batch_size):
+        out = forward_batch(np.concatenate(arrays[start:start + batch_size]))
+        for i, p in zip(rows[start:start + batch_size], out):
+            probabilities[i] = p
+    return probabilities
+
+def embed_image(image_bytes):
+    features, _ = extract_features(preprocess_image(image_bytes))
+    return features.asnumpy()
 
 # --- Prediction REST ---
 @app.post("/predict")
-async def predict(file: UploadFile = File(...)):
+async def predict(request: Request, file: UploadFile = File(...),
+                  priority: str = Form("normal"), deadline_ms: float = Form(None), explain: bool = Form(False)):
     image_bytes = await file.read()
-    input_data = preprocess_image(image_bytes)
-    net.set_train(False)
-    output = net(input_data)
+    client = request.headers.get("x-client-id") or f"{request.client.host}:{request.client.port}"
+    request_id = None
+    try:
+        if explain and has_cell_graph():
+            probabilities, request_id = await classify_explainable(
+                image_bytes, priority=priority, client=client, deadline_ms=deadline_ms)
+        else:
+            probabilities = await classify(image_bytes, priority=priority, client=client, deadline_ms=deadline_ms)
+    except (ValueError, OSError, sc.DeadlineExceeded) as e:
+        return {"status": "error", "message": str(e)}
 
-    # softmax to get probabilities
-    probabilities = ops.Softmax()(output).asnumpy()
     predicted_class = int(np.argmax(probabilities))
-    confidence = float(probabilities[0][predicted_class])
-    return {
+    confidence = float(probabilities[predicted_class])
+    response = {
         "class": predicted_class,
         "class_name": rock_classes[predicted_class],
         "confidence": confidence
     }
+    if request_id:
+        response["request_id"] = request_id
+    return response
+
+MAX_BATCH_FILES = 64
+
+@app.post("/predict_batch")
+async def predict_batch(request: Request, files: List[UploadFile] = File(...),
+                        priority: str = Form("bulk"), deadline_ms: float = Form(None)):
+    # Several images in one request and one forward pass per batch (used by rock_client batching)
+    if len(files) > MAX_BATCH_FILES:
+        return {"status": "error", "message": f"At most {MAX_BATCH_FILES} files per request."}
+    images = [await f.read() for f in files]
+    client = request.headers.get("x-client-id") or f"{request.client.host}:{request.client.port}"
+    try:
+        outputs = await scheduler.submit(classify_batch, images, priority=priority, client=client,
+                                         deadline_ms=deadline_ms)
+    except (ValueError, sc.DeadlineExceeded) as e:
+        return {"status": "error", "message": str(e)}
+
+    results = []
+    for probabilities in outputs:
+        if isinstance(probabilities, str):
+            results.append({"status": "error", "message": probabilities})
+            continue
+        predicted_class = int(np.argmax(probabilities))
+        results.append({
+            "class": predicted_class,
+            "class_name": rock_classes[predicted_class],
+            "confidence": float(probabilities[predicted_class])
+        })
+    return {"results": results}
+
+@app.post("/predict_tiled")
+async def predict_tiled(request: Request, file: UploadFile = File(...),
+                        tile: int = Form(224), overlap: float = Form(0.25), batch_size: int = Form(None),
+                        class_map: bool = Form(False), priority: str = Form("bulk")):
+    # For large photos: classify overlapping tiles instead of squashing the image to 224x224
+    image_bytes = await file.read()
+    client = request.headers.get("x-client-id") or f"{request.client.host}:{request.client.port}"
+    batch_size = batch_size or tuned_batch_size()
+    try:
+        result = await scheduler.submit(
+            tiling.classify_tiled, image_bytes, forward_batch,
+            min(max(tile, 32), 2048), min(max(overlap, 0.0), 0.9), min(max(batch_size, 1), 64),
+            tiling.MAX_SIDE, class_map, priority=priority, client=client)
+    except (ValueError, OSError) as e:
+        return {"status": "error", "message": str(e)}
+
+    probabilities = result["probabilities"]
+    predicted_class = int(np.argmax(probabilities))
+    response = {
+        "class": predicted_class,
+        "class_name": rock_classes[predicted_class],
+        "confidence": float(probabilities[predicted_class]),
+        "tiles": result["tiles"],
+        "grid": list(result["grid"]),
+        "decoded_size": list(result["decoded_size"])
+    }
+    if class_map:
+        response["class_map"] = [[rock_classes[c] for c in row] for row in result["class_map"]]
+        response["tile_confidence"] = result["tile_confidence"].round(4).tolist()
+    return response
+
+@app.post("/predict_heads")
+async def predict_heads(request: Request, file: UploadFile = File(...), heads: str = Form(None),
+                        priority: str = Form("normal")):
+    # Predictions from several fine-tuned heads for the cost of one backbone pass
+    if shared is None:
+        return {"status": "error", "message": "Shared heads are not available when serving a MindIR graph."}
+    names = [h.strip() for h in heads.split(",") if h.strip()] if heads else None
+    unknown = [h for h in names or [] if h not in shared.heads]
+    if unknown:
+        return {"status": "error", "message": f"Unknown heads: {', '.join(unknown)}"}
+    image_bytes = await file.read()
+    client = request.headers.get("x-client-id") or f"{request.client.host}:{request.client.port}"
+    try:
+        # decoded on the worker: large uploads never block the event loop or skip the queue
+        results = await scheduler.submit(classify_heads, image_bytes, names, priority=priority, client=client)
+    except (ValueError, OSError, sc.DeadlineExceeded) as e:
+        return {"status": "error", "message": str(e)}
+
+    predictions = {}
+    for name, (probabilities, class_names) in results.items():
+        predicted_class = int(np.argmax(probabilities[0]))
+        predictions[name] = {
+            "class": predicted_class,
+            "class_name": class_names[predicted_class],
+            "confidence": float(probabilities[0][predicted_class])
+        }
+    return {"serving": current_ckpt, "predictions": predictions}
+
+@app.get("/autotune")
+async def autotune_results():
+    if autotune_result is None:
+        return {"status": "error", "message": "No autotune result for this host and checkpoint (run autotune.py or set ROCK_AUTOTUNE=1)."}
+    return autotune_result
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    return scheduler.stats()
+
+@app.get("/pipeline/stats")
+async def pipeline_stats():
+    if decode_pipeline is None:
+        return {"status": "error", "message": "Decode pipeline is disabled (set ROCK_DECODE_WORKERS)."}
+    return decode_pipeline.stats()
+
+@app.on_event("startup")
+async def start_pipeline():
+    global decode_pipeline, watchdog
+    if decode_workers > 0:
+        decode_pipeline = pl.DecodePipeline(workers=decode_workers, inference_workers=inference_workers)
+    watchdog = mem.MemoryWatchdog(limit_mb=memory_limit_mb, action=memory_action)
+
+@app.on_event("shutdown")
+async def stop_pipeline():
+    if decode_pipeline is not None:
+        decode_pipeline.close()
+    if watchdog is not None:
+        watchdog.stop()
+
+# --- Load shedding ---
+SHED_PATHS = ("/predict", "/predict_batch", "/predict_tiled", "/predict_heads", "/embed", "/similar")
+
+def shedding():
+    return watchdog is not None and watchdog.shedding
+
+@app.middleware("http")
+async def shed_load(request: Request, call_next):
+    if shedding() and request.url.path in SHED_PATHS:
+        return JSONResponse({"status": "error", "message": "Server is over its memory limit, try again later."},
+                            status_code=503)
+    return await call_next(request)
+
+# --- Embedding REST ---
+def has_cell_graph():
+    # Embeddings need the backbone/head split, which a MindIR graph does not expose
+    return isinstance(net, mn.MobileNetV2Combine)
+
+@app.post("/embed")
+async def embed(request: Request, file: UploadFile = File(...), priority: str = Form("normal")):
+    if not has_cell_graph():
+        return {"status": "error", "message": "Embeddings are not available when serving a MindIR graph."}
+    image_bytes = await file.read()
+    client = request.headers.get("x-client-id") or f"{request.client.host}:{request.client.port}"
+    try:
+        embedding = (await scheduler.submit(embed_image, image_bytes, priority=priority, client=client))[0]
+    except (ValueError, OSError, sc.DeadlineExceeded) as e:
+        return {"status": "error", "message": str(e)}
+    return {"dim": int(embedding.shape[0]), "embedding": embedding.tolist()}
+
+def find_similar(image_bytes, k):
+    features, output = extract_features(preprocess_image(image_bytes))
+    return ops.Softmax()(output).asnumpy(), embedding_index.query(features.asnumpy(), k)
+
+@app.post("/similar")
+async def similar(request: Request, file: UploadFile = File(...), k: int = Form(5), priority: str = Form("normal")):
+    if embedding_index is None or len(embedding_index) == 0:
+        return {"status": "error", "message": "Embedding index is not built."}
+    if not has_cell_graph():
+        return {"status": "error", "message": "Embeddings are not available when serving a MindIR graph."}
+    if embedding_index.backbone != shared.fingerprint:
+        # neighbours from another backbone's vectors would look confident and be wrong
+        return {"status": "error", "message": "Embedding index was built with a different backbone; "
+                                              "rebuild it with embedding_index.py build."}
+    image_bytes = await file.read()
+    client = request.headers.get("x-client-id") or f"{request.client.host}:{request.client.port}"
+    try:
+        probabilities, neighbours = await scheduler.submit(find_similar, image_bytes, k, priority=priority,
+                                                           client=client)
+    except (ValueError, OSError, sc.DeadlineExceeded) as e:
+        return {"status": "error", "message": str(e)}
+    predicted_class = int(np.argmax(probabilities))
+    return {
+        "status": "success",
+        "class": predicted_class,
+        "class_name": rock_classes[predicted_class],
+        "confidence": float(probabilities[0][predicted_class]),
+        "neighbours": neighbours
+    }
+
+# --- Explanations ---
+@app.get("/explain/{request_id}")
+async def explain_prediction(request_id: str, class_name: str = None, versus: str = None, format: str = "json"):
+    # Heatmap for an earlier /predict or /ws call made with explain=true; no second backbone pass
+    entry = activations.get(request_id)
+    if entry is None:
+        return {"status": "error", "message": "Unknown or expired request id."}
+    names = entry["class_names"]
+    for name in (class_name, versus):
+        if name is not None and name not in names:
+            return {"status": "error", "message": f"Unknown class: {name}"}
+    target = names.index(class_name) if class_name else int(np.argmax(entry["probabilities"]))
+    other = names.index(versus) if versus else None
+    cam = ex.class_activation_map(entry["feature_map"], entry["weights"], target, other)
+    if format == "png":
+        return Response(content=ex.heatmap_png(cam), media_type="image/png")
+    return {
+        "request_id": request_id,
+        "class_name": names[target],
+        "versus": versus,
+        "probability": float(entry["probabilities"][target]),
+        "grid": list(cam.shape),
+        "heatmap": cam.round(4).tolist()
+    }
+
+@app.get("/explain")
+async def explain_stats():
+    return activations.stats()
+
+# --- Admin: sampling profiler ---
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile(seconds: float = 5.0, hz: int = 100, format: str = "collapsed", include_idle: bool = False):
+    seconds = min(max(seconds, 0.1), 60.0)
+    hz = min(max(hz, 1), 1000)
+    # sample from a thread so the event loop keeps serving the traffic being profiled
+    stacks, categories, ticks = await asyncio.to_thread(profiler.sample, seconds, hz, include_idle)
+    if format == "json":
+        return profiler.summary(stacks, categories, ticks, seconds, hz)
+    return PlainTextResponse(profiler.collapsed(stacks))
+
+# --- Admin: memory diagnostics ---
+LIVE_TYPES = ["MobileNetV2Combine", "MobileNetV2Backbone", "MobileNetV2Head", "GraphCell",
+              "Tensor", "Parameter", "Image"]
+
+@app.get("/admin/memory", dependencies=[Depends(require_admin)])
+async def memory_stats(points: int = 120, objects: bool = True):
+    stats = watchdog.stats(points) if watchdog is not None else {"rss_mb": (mem.rss_bytes() or 0) / 2 ** 20}
+    if objects:
+        # walks every gc-tracked object, so keep it off the event loop
+        stats["live_objects"] = await asyncio.to_thread(mem.live_objects, LIVE_TYPES)
+    stats["tracemalloc"] = allocations.stats()
+    stats["activation_cache"] = activations.stats()
+    return stats
+
+@app.post("/admin/memory/tracemalloc", dependencies=[Depends(require_admin)])
+async def toggle_tracemalloc(enabled: bool = Form(True), frames: int = Form(10)):
+    if enabled:
+        allocations.start(min(max(frames, 1), 50))
+    else:
+        allocations.stop()
+    return allocations.stats()
+
+@app.post("/admin/memory/snapshot", dependencies=[Depends(require_admin)])
+async def memory_snapshot(name: str = Form(None)):
+    try:
+        name = await asyncio.to_thread(allocations.snapshot, name)
+    except RuntimeError as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", "snapshot": name, "snapshots": list(allocations.snapshots)}
+
+@app.get("/admin/memory/top", dependencies=[Depends(require_admin)])
+async def memory_top(limit: int = 20, group_by: str = "lineno"):
+    if group_by not in ("lineno", "filename", "traceback"):
+        return {"status": "error", "message": "group_by must be lineno, filename or traceback."}
+    try:
+        return await asyncio.to_thread(allocations.top, min(max(limit, 1), 200), group_by)
+    except RuntimeError as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/admin/memory/diff", dependencies=[Depends(require_admin)])
+async def memory_diff(old: str, new: str = None, limit: int = 20, group_by: str = "lineno"):
+    # growth between two snapshots, or from one snapshot to now
+    try:
+        return await asyncio.to_thread(allocations.diff, old, new, min(max(limit, 1), 200), group_by)
+    except (KeyError, RuntimeError) as e:
+        return {"status": "error", "message": str(e).strip("'")}
+
+# --- Health ---
+@app.get("/health")
+async def health():
+    return {"status": "ok", "ckpt": current_ckpt, "shedding": shedding()}
+
+# --- Admin: shadow evaluation ---
+@app.post("/admin/shadow", dependencies=[Depends(require_admin)])
+async def start_shadow(ckpt_path: str = Form(...), fraction: float = Form(0.1), threads: int = Form(1)):
+    global shadow
+    if not os.path.isfile(ckpt_path):
+        return {"status": "error", "message": "File does not exist."}
+    if not ckpt_path.endswith(".ckpt"):
+        return {"status": "error", "message": "Invalid file type. Only .ckpt allowed."}
+    try:
+        # shed shadow work whenever user requests are waiting for the serving model
+        candidate = await asyncio.to_thread(
+            sh.ShadowEvaluator, ckpt_path, num_class, rock_classes,
+            fraction=min(max(fraction, 0.0), 1.0), busy_fn=lambda: scheduler.pending() > 0,
+            threads=min(max(threads, 1), os.cpu_count() or 1))
+    except Exception as e:
+        return {"status": "error", "message": f"Failed to load checkpoint: {str(e)}"}
+    if shadow is not None:
+        shadow.stop()
+    shadow = candidate
+    return {"status": "success", "message": f"Shadowing {ckpt_path} on {candidate.fraction:.0%} of requests"}
+
+@app.get("/admin/shadow", dependencies=[Depends(require_admin)])
+async def shadow_stats():
+    if shadow is None:
+        return {"status": "error", "message": "No shadow model loaded."}
+    return shadow.stats()
+
+@app.delete("/admin/shadow", dependencies=[Depends(require_admin)])
+async def stop_shadow():
+    global shadow
+    if shadow is None:
+        return {"status": "error", "message": "No shadow model loaded."}
+    stats = shadow.stats()
+    shadow.stop()
+    shadow = None
+    return {"status": "success", "message": "Shadow model removed.", "final": stats}
+
+# --- Shared-backbone heads ---
+@app.get("/heads")
+async def list_heads():
+    if shared is None:
+        return {"status": "error", "message": "Shared heads are not available when serving a MindIR graph."}
+    return {"serving": current_ckpt, **shared.stats()}
+
+@app.post("/heads")
+async def attach_head(ckpt_path: str = Form(...)):
+    if shared is None:
+        return {"status": "error", "message": "Shared heads are not available when serving a MindIR graph."}
+    if not os.path.isfile(ckpt_path):
+        return {"status": "error", "message": "File does not exist."}
+    if not ckpt_path.endswith(".ckpt"):
+        return {"status": "error", "message": "Invalid file type. Only .ckpt allowed."}
+    try:
+        param_dict = await asyncio.to_thread(load_checkpoint, ckpt_path)
+        if not await asyncio.to_thread(shared.matches, ckpt_path, param_dict):
+            return {"status": "error", "message": "Checkpoint does not share the resident backbone weights."}
+        with inference_lock:
+            shared.attach(ckpt_path, param_dict, rock_classes)
+    except Exception as e:
+        return {"status": "error", "message": f"Failed to load checkpoint: {str(e)}"}
+    return {"status": "success", "message": f"Attached head from {ckpt_path}", "heads": list(shared.heads)}
+
+@app.delete("/heads")
+async def detach_head(ckpt_path: str):
+    if shared is None or ckpt_path not in shared.heads:
+        return {"status": "error", "message": "No such head."}
+    if ckpt_path == current_ckpt:
+        return {"status": "error", "message": "Cannot detach the serving head."}
+    with inference_lock:
+        shared.detach(ckpt_path)
+    return {"status": "success", "message": f"Detached head {ckpt_path}", "heads": list(shared.heads)}
 
 # --- Change Model REST ---
 @app.post("/change_model")
 async def change_model(ckpt_path: str = Form(...)):
     if not os.path.isfile(ckpt_path):
         return {"status": "error", "message": "File does not exist."}
-    if not ckpt_path.endswith(".ckpt"):
-        return {"status": "error", "message": "Invalid file type. Only .ckpt allowed."}
+    if not ckpt_path.endswith((".ckpt", ".mindir")):
+        return {"status": "error", "message": "Invalid file type. Only .ckpt or .mindir allowed."}
     try:
         load_model(ckpt_path)
         return {"status": "success", "message": f"Model changed to {ckpt_path}"}
@@ -82,25 +622,83 @@ async def change_model(ckpt_path: str = Form(...)):
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    # the router names the original caller in X-Client-Id
+    client = websocket.headers.get("x-client-id") or f"ws:{id(websocket)}"
     try:
         while True:
-            data = await websocket.receive_text()
-            image_data = base64.b64decode(json.loads(data)["data"])
-            input_data = preprocess_image(image_data)
-            net.set_train(False)
-            output = net(input_data)
+            message = json.loads(await websocket.receive_text())
+            if shedding():
+                await websocket.send_text(json.dumps({"type": "error", "message": "Server is over its memory limit, try again later."}))
+                continue
+            image_data = base64.b64decode(message["data"])
+            request_id = None
+            options = dict(priority=message.get("priority", "normal"),
+                           client=message.get("client_id", client),
+                           deadline_ms=message.get("deadline_ms"))
+            try:
+                if message.get("explain") and has_cell_graph():
+                    probabilities, request_id = await classify_explainable(image_data, **options)
+                else:
+                    probabilities = await classify(image_data, **options)
+            except (ValueError, OSError, sc.DeadlineExceeded) as e:
+                await websocket.send_text(json.dumps({"type": "error", "message": str(e)}))
+                continue
 
-            # softmax for probabilities
-            probabilities = ops.Softmax()(output).asnumpy()
             predicted_class = int(np.argmax(probabilities))
-            confidence = float(probabilities[0][predicted_class])
+            confidence = float(probabilities[predicted_class])
             predicted_class_str = rock_classes[predicted_class]
 
-            await websocket.send_text(json.dumps({
+            response = {
                 "type": "prediction",
                 "class": predicted_class_str,
                 "class_index": predicted_class,
                 "confidence": confidence
-            }))
+            }
+            if request_id:
+                response["request_id"] = request_id
+            await websocket.send_text(json.dumps(response))
+    except WebSocketDisconnect:
+        pass
+
+# --- Streaming WebSocket ---
+@app.websocket("/ws/stream")
+async def websocket_stream(websocket: WebSocket, fps: float = 10.0, window: int = 5,
+                           priority: str = "normal", deadline_ms: float = None):
+    # Latest-frame-wins: stale frames are dropped instead of queued
+    await websocket.accept()
+    if priority not in scheduler.priorities:
+        await websocket.send_text(json.dumps({"type": "error", "message": f"Unknown priority '{priority}'"}))
+        await websocket.close()
+        return
+    client = websocket.headers.get("x-client-id") or f"ws:{id(websocket)}"
+
+    async def classify_frame(image_bytes):
+        # same scheduler as every other request: priority, fair share and deadline apply
+        return await classify(image_bytes, priority=priority, client=client, deadline_ms=deadline_ms)
+
+    state = st.LatestFrameStream(classify_frame, max_fps=fps, window=window)
+
+    async def send_prediction(probabilities, smoothed, stats):
+        predicted_class = int(np.argmax(smoothed))
+        await websocket.send_text(json.dumps({
+            "type": "prediction",
+            "class": rock_classes[predicted_class],
+            "class_index": predicted_class,
+            "confidence": float(smoothed[predicted_class]),
+            "frame_class": rock_classes[int(np.argmax(probabilities))],
+            "stats": stats
+        }))
+
+    async def send_error(error, stats):
+        await websocket.send_text(json.dumps({"type": "error", "message": str(error), "stats": stats}))
+
+    worker = asyncio.create_task(state.run(send_prediction, send_error))
+    try:
+        while True:
+            message = json.loads(await websocket.receive_text())
+            state.push(base64.b64decode(message["data"]), message.get("ts"))
     except WebSocketDisconnect:
         pass
+    finally:
+        state.close()
+        worker.cancel()
@@ -0,0 +1,219 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = "benchmarks"
+DEFAULT_BATCHES = (1, 8, 32)
+DEFAULT_WIDTHS = (0.5, 1.0)
+DEFAULT_RESOLUTIONS = (160, 224)
+
+
+def summarize(samples):
+    """Summary statistics in milliseconds for a list of timings in seconds."""
+    ms_ = np.array(samples) * 1000
+    return {
+        "n": len(ms_),
+        "min": float(ms_.min()),
+        "median": float(np.median(ms_)),
+        "mean": float(ms_.mean()),
+        "stdev": float(ms_.std(ddof=1)) if len(ms_) > 1 else 0.0,
+        "p25": float(np.percentile(ms_, 25)),
+        "p75": float(np.percentile(ms_, 75)),
+        "p95": float(np.percentile(ms_, 95)),
+    }
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", "mobilenet_ms.py"], capture_output=True,
+                               text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "") if out.returncode == 0 else None
+    except OSError:
+        return None
+
+
+def host_metadata():
+    import mindspore as ms
+    return {
+        "host": socket.gethostname(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "mindspore": ms.__version__,
+        "commit": git_commit(),
+    }
+
+
+# --- Measurements ---
+def bench_construct(width_mult, repeats):
+    import mobilenet_ms as mn
+    mn.mobilenet_v2(12, width_mult=width_mult)  # warmup: first build pays import/registration costs
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        mn.mobilenet_v2(12, width_mult=width_mult)
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def bench_forward(width_mult, resolution, batch_size, warmup, repeats):
+    import mindspore as ms
+    from mindspore import Tensor
+    import mobilenet_ms as mn
+    net = mn.mobilenet_v2(12, width_mult=width_mult)
+    net.set_train(False)
+    x = Tensor(np.random.rand(batch_size, 3, resolution, resolution).astype(np.float32), ms.float32)
+
+    start = time.perf_counter()
+    net(x).asnumpy()
+    first_call = time.perf_counter() - start
+    for _ in range(warmup):
+        net(x).asnumpy()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        net(x).asnumpy()
+        times.append(time.perf_counter() - start)
+    stats = summarize(times)
+    return {
+        "first_call_ms": first_call * 1000,
+        "latency_ms": stats,
+        "images_per_sec": batch_size * 1000 / stats["median"],
+    }
+
+
+def run(batches=DEFAULT_BATCHES, widths=DEFAULT_WIDTHS, resolutions=DEFAULT_RESOLUTIONS,
+        warmup=5, repeats=30, construct_repeats=10):
+    results = {"meta": host_metadata(), "started_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+               "settings": {"warmup": warmup, "repeats": repeats, "construct_repeats": construct_repeats},
+               "cases": {}}
+    for w in widths:
+        key = f"construct/w{w}"
+        results["cases"][key] = {"construct_ms": bench_construct(w, construct_repeats)}
+        print(f"{key:<32}median {results['cases'][key]['construct_ms']['median']:8.2f} ms")
+        for r in resolutions:
+            for b in batches:
+                key = f"forward/w{w}/r{r}/b{b}"
+                results["cases"][key] = bench_forward(w, r, b, warmup, repeats)
+                lat = results["cases"][key]["latency_ms"]
+                print(f"{key:<32}median {lat['median']:8.2f} ms  p95 {lat['p95']:8.2f} ms"
+                      f"  {results['cases'][key]['images_per_sec']:8.1f} img/s")
+    return results
+
+
+def save(results):
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    commit = results["meta"]["commit"] or "nocommit"
+    path = os.path.join(BENCH_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+# --- History / comparison ---
+def history():
+    return sorted(glob.glob(os.path.join(BENCH_DIR, "*.json")))
+
+
+def resolve(ref):
+    """A result file path, or a commit hash matched against the history (latest run wins)."""
+    if os.path.isfile(ref):
+        return ref
+    matches = [p for p in history() if f"-{ref}" in os.path.basename(p)]
+    if not matches:
+        raise FileNotFoundError(f"No benchmark result for {ref!r} in {BENCH_DIR}/")
+    return matches[-1]
+
+
+def _timing(case):
+    return case["construct_ms"] if "construct_ms" in case else case["latency_ms"]
+
+
+def compare(base, new, threshold=0.10):
+    """Cases whose median got more than threshold slower.
+
+    A case only counts as a regression when the interquartile ranges do not
+    overlap as well, so ordinary run-to-run noise is not flagged.
+    """
+    rows = []
+    for key in sorted(set(base["cases"]) & set(new["cases"])):
+        a, b = _timing(base["cases"][key]), _timing(new["cases"][key])
+        change = b["median"] / a["median"] - 1
+        regressed = change > threshold and b["p25"] > a["p75"]
+        improved = change < -threshold and b["p75"] < a["p25"]
+        rows.append({"case": key, "base_ms": a["median"], "new_ms": b["median"], "change": change,
+                     "status": "REGRESSION" if regressed else "faster" if improved else ""})
+    return rows
+
+
+def print_comparison(rows, base_meta, new_meta):
+    print(f"base: {base_meta.get('commit')} on {base_meta.get('host')}")
+    print(f"new:  {new_meta.get('commit')} on {new_meta.get('host')}")
+    if base_meta.get("host") != new_meta.get("host"):
+        print("warning: results come from different hosts")
+    print(f"\n{'case':<32}{'base ms':>10}{'new ms':>10}{'change':>9}")
+    for r in rows:
+        print(f"{r['case']:<32}{r['base_ms']:>10.2f}{r['new_ms']:>10.2f}{r['change'] * 100:>8.1f}%  {r['status']}")
+
+
+def _ints(s):
+    return [int(v) for v in s.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks for mobilenet_ms.py.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="measure and append a result to the history")
+    p.add_argument("--batches", default=",".join(map(str, DEFAULT_BATCHES)))
+    p.add_argument("--widths", default=",".join(map(str, DEFAULT_WIDTHS)))
+    p.add_argument("--resolutions", default=",".join(map(str, DEFAULT_RESOLUTIONS)))
+    p.add_argument("--warmup", type=int, default=5)
+    p.add_argument("--repeats", type=int, default=30)
+    p.add_argument("--construct-repeats", type=int, default=10)
+
+    p = sub.add_parser("compare", help="compare two results; exits 1 on regressions")
+    p.add_argument("base", nargs="?", help="result file or commit (default: second-latest run)")
+    p.add_argument("new", nargs="?", help="result file or commit (default: latest run)")
+    p.add_argument("--threshold", type=float, default=0.10, help="relative slowdown that counts as a regression")
+
+    sub.add_parser("history", help="list stored results")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run(_ints(args.batches), [float(w) for w in args.widths.split(",")], _ints(args.resolutions),
+                      args.warmup, args.repeats, args.construct_repeats)
+        print(f"\nSaved to {save(results)}")
+    elif args.command == "history":
+        for path in history():
+            with open(path, "r", encoding="utf-8") as f:
+                meta = json.load(f)["meta"]
+            print(f"{os.path.basename(path):<40}{meta.get('host')}")
+    else:
+        runs = history()
+        if args.base is None and len(runs) < 2:
+            sys.exit("Need two stored results to compare; run the benchmark first.")
+        base_path = resolve(args.base) if args.base else runs[-2]
+        new_path = resolve(args.new) if args.new else runs[-1]
+        with open(base_path, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        with open(new_path, "r", encoding="utf-8") as f:
+            new = json.load(f)
+        rows = compare(base, new, args.threshold)
+        print_comparison(rows, base["meta"], new["meta"])
+        regressions = [r for r in rows if r["status"] == "REGRESSION"]
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold * 100:.0f}%")
+            sys.exit(1)
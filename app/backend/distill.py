@@ -0,0 +1,190 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import mindspore as ms
+import mindspore.nn as nn
+import mindspore.ops as ops
+from mindspore import Tensor
+from mindspore.train.serialization import save_checkpoint
+
+import mobilenet_ms as mn
+from prune import rock_classes, load_net, load_val, evaluate, measure_latency, count_flops_params
+
+# Default MobileNetV2 stages with fewer repeats per stage (t, c, n, s)
+SLIM_SETTING = [
+    [1, 16, 1, 1],
+    [6, 24, 2, 2],
+    [6, 32, 2, 2],
+    [6, 64, 2, 2],
+    [6, 96, 2, 1],
+    [6, 160, 2, 2],
+    [6, 320, 1, 1],
+]
+DEFAULT_SETTING = [
+    [1, 16, 1, 1],
+    [6, 24, 2, 2],
+    [6, 32, 3, 2],
+    [6, 64, 4, 2],
+    [6, 96, 3, 1],
+    [6, 160, 3, 2],
+    [6, 320, 1, 1],
+]
+
+
+class DistillWithLoss(nn.Cell):
+    """alpha * soft-target loss at temperature T + (1 - alpha) * hard-label cross-entropy."""
+
+    def __init__(self, student, temperature=4.0, alpha=0.7):
+        super(DistillWithLoss, self).__init__(auto_prefix=False)
+        self.student = student
+        self.temperature = temperature
+        self.alpha = alpha
+        self.log_softmax = nn.LogSoftmax(axis=1)
+        self.sum = ops.ReduceSum()
+        self.mean = ops.ReduceMean()
+        self.ce = nn.SoftmaxCrossEntropyWithLogits(sparse=True, reduction="mean")
+
+    def construct(self, x, teacher_probs, labels):
+        logits = self.student(x)
+        log_p = self.log_softmax(logits / self.temperature)
+        # scaled by T^2 so the soft-target gradients keep their magnitude as T grows
+        soft = -self.mean(self.sum(teacher_probs * log_p, 1)) * self.temperature * self.temperature
+        return self.alpha * soft + (1 - self.alpha) * self.ce(logits, labels)
+
+
+# --- Student construction ---
+def student_config(width_mult, slim):
+    config = {}
+    if width_mult != 1.0:
+        config["width_mult"] = width_mult
+    if slim:
+        config["inverted_residual_setting"] = SLIM_SETTING
+    return config
+
+
+def _block_map(student_setting, teacher_setting):
+    """Student feature index -> teacher feature index, keeping the first blocks of every stage."""
+    mapping = {0: 0}
+    s_idx, t_idx = 1, 1
+    for (_, _, s_n, _), (_, _, t_n, _) in zip(student_setting, teacher_setting):
+        for i in range(min(s_n, t_n)):
+            mapping[s_idx + i] = t_idx + i
+        s_idx += s_n
+        t_idx += t_n
+    mapping[s_idx] = t_idx  # final 1x1 conv
+    return mapping
+
+
+def init_from_teacher(student, teacher, config, teacher_config):
+    """Copy teacher weights into every student layer whose shapes match.
+
+    Works when the student keeps the teacher's width (e.g. the slim setting):
+    each stage then starts from the teacher's first blocks instead of noise.
+    """
+    s_setting = config.get("inverted_residual_setting", DEFAULT_SETTING)
+    t_setting = teacher_config.get("inverted_residual_setting", DEFAULT_SETTING)
+    s_features, t_features = student.backbone.features, teacher.backbone.features
+    copied = 0
+    for s_i, t_i in _block_map(s_setting, t_setting).items():
+        s_params = list(s_features[s_i].get_parameters())
+        t_params = list(t_features[t_i].get_parameters())
+        if len(s_params) != len(t_params) or any(a.shape != b.shape for a, b in zip(s_params, t_params)):
+            continue
+        for a, b in zip(s_params, t_params):
+            a.set_data(Tensor(b.asnumpy()))
+        copied += 1
+    if student.head.dense.weight.shape == teacher.head.dense.weight.shape:
+        student.head.dense.weight.set_data(Tensor(teacher.head.dense.weight.asnumpy()))
+        student.head.dense.bias.set_data(Tensor(teacher.head.dense.bias.asnumpy()))
+    return copied
+
+
+# --- Training ---
+def distill(teacher, student, x, y, epochs=30, batch_size=32, lr=0.05, temperature=4.0, alpha=0.7, seed=0):
+    steps_per_epoch = max(1, len(x) // batch_size)
+    schedule = nn.cosine_decay_lr(0.0, lr, steps_per_epoch * epochs, steps_per_epoch, epochs)
+    optimizer = nn.Momentum(student.trainable_params(), learning_rate=schedule, momentum=0.9, weight_decay=4e-5)
+    step = nn.TrainOneStepCell(DistillWithLoss(student, temperature, alpha), optimizer)
+    step.set_train(True)
+    teacher.set_train(False)
+
+    rng = np.random.default_rng(seed)
+    for epoch in range(epochs):
+        order = rng.permutation(len(x))
+        losses = []
+        start = time.perf_counter()
+        for s in range(steps_per_epoch):
+            idx = order[s * batch_size:(s + 1) * batch_size]
+            batch = x[idx]
+            # random horizontal flip; the teacher sees the same augmented batch
+            flip = rng.random(len(idx)) < 0.5
+            batch[flip] = batch[flip][..., ::-1]
+            inputs = Tensor(np.ascontiguousarray(batch), ms.float32)
+            logits = teacher(inputs).asnumpy() / temperature
+            logits -= logits.max(axis=1, keepdims=True)
+            soft = np.exp(logits)
+            soft /= soft.sum(axis=1, keepdims=True)
+            loss = step(inputs, Tensor(soft, ms.float32), Tensor(y[idx].astype(np.int32)))
+            losses.append(float(loss.asnumpy()))
+        print(f"epoch {epoch + 1}/{epochs}  loss {np.mean(losses):.4f}  {time.perf_counter() - start:.1f}s")
+    step.set_train(False)
+    student.set_train(False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill the serving checkpoint into a smaller MobileNetV2.")
+    parser.add_argument("--teacher", default="ckpt/mobilenet_v2-25_74.ckpt")
+    parser.add_argument("--train", default="../../dataset/rocks_train")
+    parser.add_argument("--val", default="../../dataset/rocks_val")
+    parser.add_argument("--width-mult", type=float, default=0.5)
+    parser.add_argument("--slim", action="store_true", help="fewer inverted residual blocks per stage")
+    parser.add_argument("--init", default=None, help="start the student from this checkpoint (e.g. a pruned one)")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--lr", type=float, default=0.05)
+    parser.add_argument("--temperature", type=float, default=4.0)
+    parser.add_argument("--alpha", type=float, default=0.7, help="weight of the soft-target loss")
+    args = parser.parse_args()
+
+    teacher = load_net(args.teacher)
+    teacher_config = mn.load_arch_config(args.teacher)
+    if args.init:
+        student = load_net(args.init)
+        config = mn.load_arch_config(args.init)
+    else:
+        config = student_config(args.width_mult, args.slim)
+        student = mn.mobilenet_v2(len(rock_classes), **config)
+        copied = init_from_teacher(student, teacher, config, teacher_config)
+        print(f"Initialized {copied} student layers from the teacher")
+
+    x, y = load_val(args.train)
+    print(f"Loaded {len(x)} training images")
+    distill(teacher, student, x, y, args.epochs, args.batch_size, args.lr, args.temperature, args.alpha)
+    del x
+
+    out = args.out or f"{os.path.splitext(args.teacher)[0]}-student.ckpt"
+    save_checkpoint(student, out)
+    # the sidecar tells load_model() how to build the smaller network
+    mn.save_arch_config(out, config)
+    print(f"Saved {out} (+ {os.path.basename(mn.arch_config_path(out))})")
+
+    x_val, y_val = load_val(args.val) if os.path.isdir(args.val) else (None, None)
+    rows = []
+    for name, net, path in (("teacher", teacher, args.teacher), ("student", student, out)):
+        macs, params = count_flops_params(net)
+        acc = evaluate(net, x_val, y_val) if x_val is not None else float("nan")
+        rows.append((name, acc, measure_latency(net), params / 1e6, os.path.getsize(path) / 2 ** 20, macs / 1e6))
+
+    print(f"\n{'model':<10}{'val acc':>10}{'latency ms':>12}{'params (M)':>12}{'ckpt MB':>10}{'MMACs':>10}")
+    for name, acc, latency, params, size, macs in rows:
+        print(f"{name:<10}{acc:>10.4f}{latency:>12.2f}{params:>12.2f}{size:>10.2f}{macs:>10.1f}")
+    t, s = rows
+    print(f"\nstudent vs teacher: accuracy {s[1] - t[1]:+.4f}, {t[2] / s[2]:.2f}x faster, "
+          f"{s[4] / t[4]:.0%} of the checkpoint size")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import json
+import os
+import sys
+import time
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def _normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    if x.ndim == 1:
+        x = x[np.newaxis, :]
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def _topk(scores, k):
+    # argpartition first, then sort only the k survivors of every row
+    k = min(k, scores.shape[1])
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+class EmbeddingIndex:
+    """Cosine-similarity index over L2-normalized embeddings.
+
+    Exact mode scores every query against every stored vector with one matrix
+    multiplication per chunk. Approximate mode clusters the vectors with
+    k-means (an inverted file) and only scores the `nprobe` closest clusters.
+    """
+
+    def __init__(self, dim=1280, approximate=False, nlist=None, nprobe=8, chunk_size=65536, backbone=None):
+        self.dim = dim
+        # heads.backbone_fingerprint of the network that produced the vectors
+        self.backbone = backbone
+        self.approximate = approximate
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.chunk_size = chunk_size
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._size = 0
+        self.paths = []
+        self.labels = []
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self._lists = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self):
+        return self._vectors[:self._size]
+
+    def __contains__(self, path):
+        return path in set(self.paths)
+
+    # --- Adding ---
+    def reserve(self, capacity):
+        """Preallocate room for `capacity` vectors so large builds never copy the buffer."""
+        if capacity > self._vectors.shape[0]:
+            grown = np.empty((capacity, self.dim), dtype=np.float32)
+            grown[:self._size] = self.vectors
+            self._vectors = grown
+
+    def add(self, vectors, paths=None, labels=None):
+        vectors = _normalize(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d vectors, got {vectors.shape[1]}")
+        n = vectors.shape[0]
+        if paths is None:
+            paths = [""] * n
+        if labels is None:
+            labels = [""] * n
+        if len(paths) != n or len(labels) != n:
+            raise ValueError("paths and labels must match the number of vectors")
+
+        # grow geometrically so repeated small adds stay amortized O(1)
+        needed = self._size + n
+        if needed > self._vectors.shape[0]:
+            self.reserve(max(needed, 2 * self._vectors.shape[0], 1024))
+        self._vectors[self._size:needed] = vectors
+        self._size = needed
+        self.paths.extend(paths)
+        self.labels.extend(labels)
+
+        if self.centroids is not None:
+            new_assign = self._assign(vectors)
+            self.assignments = np.concatenate([self.assignments, new_assign])
+            self._lists = None
+
+    # --- Approximate mode ---
+    def train(self, iterations=10, sample_size=100000, seed=0):
+        """Fit the k-means coarse quantizer used by approximate search."""
+        if len(self) == 0:
+            raise ValueError("Cannot train an empty index")
+        nlist = self.nlist or max(1, int(np.sqrt(len(self))))
+        nlist = min(nlist, len(self))
+        rng = np.random.default_rng(seed)
+        sample_idx = rng.choice(len(self), size=min(sample_size, len(self)), replace=False)
+        sample = self.vectors[sample_idx]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        self.nlist = nlist
+        self.centroids = centroids
+        self.assignments = self._assign(self.vectors)
+        self._lists = None
+
+    def _assign(self, vectors):
+        out = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), self.chunk_size):
+            block = vectors[start:start + self.chunk_size]
+            out[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return out
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            bounds = np.searchsorted(self.assignments[order], np.arange(self.nlist + 1))
+            self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.nlist)]
+        return self._lists
+
+    # --- Searching ---
+    def search(self, queries, k=5):
+        """Return (indices, scores), each shaped (num_queries, k)."""
+        queries = _normalize(queries)
+        k = min(k, len(self))
+        if k == 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        if self.approximate and self.centroids is not None:
+            return self._search_ivf(queries, k)
+        return self._search_exact(queries, k)
+
+    def _search_exact(self, queries, k):
+        best_idx = None
+        best_scores = None
+        vectors = self.vectors
+        for start in range(0, len(vectors), self.chunk_size):
+            scores = queries @ vectors[start:start + self.chunk_size].T
+            idx, top = _topk(scores, k)
+            idx += start
+            if best_idx is None:
+                best_idx, best_scores = idx, top
+            else:
+                merged_idx = np.concatenate([best_idx, idx], axis=1)
+                merged_scores = np.concatenate([best_scores, top], axis=1)
+                sel, best_scores = _topk(merged_scores, k)
+                best_idx = np.take_along_axis(merged_idx, sel, axis=1)
+        return best_idx, best_scores
+
+    def _search_ivf(self, queries, k):
+        lists = self._inverted_lists()
+        nprobe = min(self.nprobe, self.nlist)
+        probes, _ = _topk(queries @ self.centroids.T, nprobe)
+        out_idx = np.full((len(queries), k), -1, dtype=np.int64)
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q in range(len(queries)):
+            candidates = np.concatenate([lists[c] for c in probes[q]])
+            if len(candidates) == 0:
+                continue
+            scores = self.vectors[candidates] @ queries[q]
+            sel, top = _topk(scores[np.newaxis, :], k)
+            out_idx[q, :sel.shape[1]] = candidates[sel[0]]
+            out_scores[q, :sel.shape[1]] = top[0]
+        return out_idx, out_scores
+
+    def query(self, vector, k=5):
+        """Search a single vector and return JSON-friendly neighbour records."""
+        idx, scores = self.search(vector, k)
+        return [
+            {"path": self.paths[i], "label": self.labels[i], "score": float(s)}
+            for i, s in zip(idx[0], scores[0]) if i >= 0
+        ]
+
+    # --- Persistence ---
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "vectors.npy"), self.vectors)
+        if self.centroids is not None:
+            np.save(os.path.join(directory, "centroids.npy"), self.centroids)
+            np.save(os.path.join(directory, "assignments.npy"), self.assignments)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "dim": self.dim,
+                "approximate": self.approximate,
+                "nlist": self.nlist,
+                "nprobe": self.nprobe,
+                "backbone": self.backbone,
+                "paths": self.paths,
+                "labels": self.labels,
+            }, f)
+
+    @classmethod
+    def load(cls, directory, mmap=False):
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(dim=meta["dim"], approximate=meta["approximate"],
+                    nlist=meta["nlist"], nprobe=meta["nprobe"], backbone=meta.get("backbone"))
+        vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r" if mmap else None)
+        index._vectors = vectors if mmap else np.array(vectors, dtype=np.float32)
+        index._size = len(vectors)
+        index.paths = meta["paths"]
+        index.labels = meta["labels"]
+        centroids_path = os.path.join(directory, "centroids.npy")
+        if os.path.isfile(centroids_path):
+            index.centroids = np.load(centroids_path)
+            index.assignments = np.load(os.path.join(directory, "assignments.npy"))
+        return index
+
+
+# --- Building from a folder of images ---
+def list_images(data_path):
+    """Yield (path, label) for every image in an ImageFolder-style tree."""
+    for label in sorted(os.listdir(data_path)):
+        class_dir = os.path.join(data_path, label)
+        if not os.path.isdir(class_dir):
+            continue
+        for name in sorted(os.listdir(class_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(class_dir, name), label
+
+
+def build_index(index, data_path, embed_fn, batch_size=32):
+    """Embed every image under data_path that is not yet in the index."""
+    known = set(index.paths)
+    pending = [(p, l) for p, l in list_images(data_path) if p not in known]
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        vectors = []
+        for path, _ in batch:
+            with open(path, "rb") as f:
+                vectors.append(embed_fn(f.read()))
+        index.add(np.concatenate(vectors), [p for p, _ in batch], [l for _, l in batch])
+        print(f"Indexed {start + len(batch)}/{len(pending)} new images")
+    return len(pending)
+
+
+# --- Latency report ---
+def benchmark(sizes=(1000, 100000, 1000000), dim=1280, k=5, queries=16, repeats=5, chunk=65536):
+    rng = np.random.default_rng(0)
+    q = rng.standard_normal((queries, dim), dtype=np.float32)
+    for n in sizes:
+        # one float32 base, generated and added in chunks: the 1M case stays at ~5 GB
+        index = EmbeddingIndex(dim=dim)
+        index.reserve(n)
+        for start in range(0, n, chunk):
+            index.add(rng.standard_normal((min(chunk, n - start), dim), dtype=np.float32))
+        for approximate in (False, True):
+            index.approximate = approximate
+            if approximate:
+                index.train(iterations=5)
+            index.search(q[:1], k)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                index.search(q, k)
+            per_query = (time.perf_counter() - start) / (repeats * queries) * 1000
+            mode = "approximate" if approximate else "exact"
+            print(f"{n:>8} vectors  {mode:<11}  {per_query:8.3f} ms/query")
+        del index
+
+if __name__ == "__main__":
+    # python embedding_index.py build <data_path> <index_dir> [--approximate]
+    # python embedding_index.py bench
+    if len(sys.argv) >= 2 and sys.argv[1] == "bench":
+        benchmark()
+    elif len(sys.argv) >= 4 and sys.argv[1] == "build":
+        import backend
+        data_path, index_dir = sys.argv[2], sys.argv[3]
+        approximate = "--approximate" in sys.argv
+        fingerprint = backend.shared.fingerprint
+        index = EmbeddingIndex.load(index_dir) if os.path.isfile(os.path.join(index_dir, "meta.json")) else None
+        if index is not None and index.backbone != fingerprint:
+            # vectors from another backbone are not comparable with new ones
+            print(f"{index_dir} was built with a different backbone, rebuilding it")
+            approximate = approximate or index.approximate
+            index = None
+        if index is None:
+            index = EmbeddingIndex(dim=backend.net.backbone.out_channels, approximate=approximate,
+                                   backbone=fingerprint)
+        added = build_index(index, data_path, backend.embed_image)
+        if index.approximate and (index.centroids is None or added > len(index) // 2):
+            index.train()
+        index.save(index_dir)
+        print(f"Index at {index_dir} holds {len(index)} images")
+    else:
+        print("Usage: python embedding_index.py build <data_path> <index_dir> [--approximate] | bench")
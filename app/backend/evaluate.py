@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+
+import numpy as np
+
+from embedding_index import list_images
+from preprocess import preprocess_array
+
+rock_classes = [
+    "Basalt", "Chert", "Coal", "Gneiss", "Granite",
+    "Limestone", "Marble", "Obsidian", "Pumice",
+    "Sandstone", "Slate", "Travertine"
+]
+
+
+# --- Decode once ---
+def load_folder(data_path):
+    """Preprocess every labelled image of an ImageFolder tree into one (N, 3, 224, 224) array."""
+    items = [(p, rock_classes.index(l)) for p, l in list_images(data_path) if l in rock_classes]
+    x = np.empty((len(items), 3, 224, 224), dtype=np.float32)
+    for i, (path, _) in enumerate(items):
+        with open(path, "rb") as f:
+            x[i] = preprocess_array(f.read())[0]
+    y = np.array([label for _, label in items], dtype=np.int64)
+    return x, y, [p for p, _ in items]
+
+
+# --- Per-checkpoint evaluation ---
+def load_net(ckpt_path):
+    import mindspore as ms
+    from mindspore.train.serialization import load_checkpoint, load_param_into_net
+    import mobilenet_ms as mn
+    if ckpt_path.endswith(".mindir"):
+        return ms.nn.GraphCell(ms.load(ckpt_path))
+    net = mn.mobilenet_v2_for_checkpoint(len(rock_classes), ckpt_path)
+    load_param_into_net(net, load_checkpoint(ckpt_path))
+    net.set_train(False)
+    return net
+
+
+def run_checkpoint(ckpt_path, x, batch_size=32):
+    """Return (predictions, load seconds, inference seconds) for one checkpoint."""
+    import mindspore as ms
+    from mindspore import Tensor
+    start = time.perf_counter()
+    net = load_net(ckpt_path)
+    load_s = time.perf_counter() - start
+
+    # one warmup batch so graph compilation is not counted as throughput
+    net(Tensor(np.ascontiguousarray(x[:batch_size]), ms.float32)).asnumpy()
+    preds = np.empty(len(x), dtype=np.int64)
+    start = time.perf_counter()
+    for i in range(0, len(x), batch_size):
+        batch = Tensor(np.ascontiguousarray(x[i:i + batch_size]), ms.float32)
+        preds[i:i + batch_size] = np.argmax(net(batch).asnumpy(), axis=1)
+    return preds, load_s, time.perf_counter() - start
+
+
+def _worker(ckpt_path, x_path, batch_size):
+    # the decoded array is memory-mapped, so every worker shares the same pages
+    x = np.load(x_path, mmap_mode="r")
+    return run_checkpoint(ckpt_path, x, batch_size)
+
+
+# --- Metrics ---
+def metrics(y, preds, num_classes=len(rock_classes)):
+    confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+    np.add.at(confusion, (y, preds), 1)
+    tp = np.diag(confusion).astype(np.float64)
+    predicted = confusion.sum(axis=0)
+    actual = confusion.sum(axis=1)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, actual, out=np.zeros_like(tp), where=actual > 0)
+    return {
+        "accuracy": float(tp.sum() / len(y)) if len(y) else 0.0,
+        "per_class": {
+            rock_classes[c]: {"precision": float(precision[c]), "recall": float(recall[c]), "support": int(actual[c])}
+            for c in range(num_classes)
+        },
+        "confusion_matrix": confusion.tolist(),
+    }
+
+
+def evaluate(checkpoints, data_path, batch_size=32, jobs=1):
+    start = time.perf_counter()
+    x, y, _ = load_folder(data_path)
+    decode_s = time.perf_counter() - start
+    print(f"Decoded {len(x)} images from {data_path} once in {decode_s:.2f}s")
+
+    outputs = {}
+    if jobs > 1 and len(checkpoints) > 1:
+        with tempfile.TemporaryDirectory() as tmp:
+            x_path = os.path.join(tmp, "x.npy")
+            np.save(x_path, x)
+            ctx = mp.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx) as pool:
+                futures = {c: pool.submit(_worker, c, x_path, batch_size) for c in checkpoints}
+                for c, f in futures.items():
+                    outputs[c] = f.result()
+    else:
+        for c in checkpoints:
+            outputs[c] = run_checkpoint(c, x, batch_size)
+
+    report = {"data": data_path, "images": len(x), "decode_seconds": decode_s, "checkpoints": {}}
+    for c in checkpoints:
+        preds, load_s, infer_s = outputs[c]
+        entry = metrics(y, preds)
+        entry["load_seconds"] = load_s
+        entry["inference_seconds"] = infer_s
+        entry["images_per_sec"] = len(x) / infer_s if infer_s else None
+        report["checkpoints"][c] = entry
+    return report
+
+
+def print_report(report):
+    print(f"\n{'checkpoint':<48}{'accuracy':>10}{'img/s':>10}{'load s':>9}")
+    for c, e in report["checkpoints"].items():
+        print(f"{os.path.basename(c):<48}{e['accuracy']:>10.4f}{e['images_per_sec']:>10.1f}{e['load_seconds']:>9.2f}")
+
+    for c, e in report["checkpoints"].items():
+        print(f"\n== {c}")
+        print(f"{'class':<12}{'precision':>10}{'recall':>10}{'n':>6}")
+        for name, m in e["per_class"].items():
+            print(f"{name:<12}{m['precision']:>10.3f}{m['recall']:>10.3f}{m['support']:>6}")
+        print("confusion (rows = true, cols = predicted):")
+        print("            " + "".join(f"{n[:5]:>6}" for n in rock_classes))
+        for name, row in zip(rock_classes, e["confusion_matrix"]):
+            print(f"{name:<12}" + "".join(f"{v:>6}" for v in row))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate several checkpoints on one decoded copy of a labelled folder.")
+    parser.add_argument("checkpoints", nargs="+", help=".ckpt or .mindir files")
+    parser.add_argument("--data", default="../../dataset/rocks_val")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--jobs", type=int, default=1, help="evaluate checkpoints in this many processes")
+    parser.add_argument("--out", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    report = evaluate(args.checkpoints, args.data, args.batch_size, args.jobs)
+    print_report(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.out}")
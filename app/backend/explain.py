@@ -0,0 +1,99 @@
+import io
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from preprocess import IMAGE_SIZE
+
+
+class ActivationCache:
+    """Final backbone feature maps of recent explainable predictions.
+
+    Entries are keyed by a request id and expire after ttl seconds; the
+    oldest entry is evicted once max_items is reached, so memory stays
+    bounded (~250 KB per entry for the default 1280x7x7 feature map).
+    """
+
+    def __init__(self, max_items=64, ttl=120.0):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._weights = {}
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.evicted = 0
+
+    def dense_weights(self, dense):
+        # one host copy per head, not per request
+        key = id(dense.weight)
+        with self._lock:
+            entry = self._weights.get(key)
+            if entry is None or entry[0] is not dense.weight:
+                if len(self._weights) >= 8:
+                    self._weights.clear()
+                entry = (dense.weight, dense.weight.asnumpy())
+                self._weights[key] = entry
+        return entry[1]
+
+    def _expire(self, now):
+        while self._items:
+            entry = next(iter(self._items.values()))
+            if now - entry["time"] <= self.ttl and len(self._items) <= self.max_items:
+                break
+            self._items.popitem(last=False)
+            self.evicted += 1
+
+    def put(self, feature_map, weights, probabilities, class_names):
+        request_id = uuid.uuid4().hex
+        now = time.monotonic()
+        with self._lock:
+            self._items[request_id] = {
+                "time": now,
+                "feature_map": feature_map,
+                "weights": weights,
+                "probabilities": probabilities,
+                "class_names": class_names,
+            }
+            self.stored += 1
+            self._expire(now)
+        return request_id
+
+    def get(self, request_id):
+        with self._lock:
+            self._expire(time.monotonic())
+            return self._items.get(request_id)
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return {"items": len(self._items), "max_items": self.max_items, "ttl_seconds": self.ttl,
+                    "stored": self.stored, "evicted": self.evicted}
+
+
+def class_activation_map(feature_map, weights, class_index, versus=None):
+    """CAM = sum over channels of dense weight x feature map, scaled to [0, 1].
+
+    With versus, the map shows where the evidence for class_index beats the
+    evidence for the other class (difference of the two weight rows).
+    """
+    w = weights[class_index]
+    if versus is not None:
+        w = w - weights[versus]
+    cam = np.tensordot(w, feature_map, axes=(0, 0))
+    cam = np.maximum(cam, 0)
+    peak = cam.max()
+    return cam / peak if peak > 0 else cam
+
+
+def heatmap_png(cam, size=IMAGE_SIZE):
+    """Upsampled heatmap as a PNG, blue (low) to red (high), at model input resolution."""
+    img = Image.fromarray(np.uint8(cam * 255)).resize((size, size), Image.BILINEAR)
+    v = np.asarray(img, dtype=np.float32) / 255.0
+    rgb = np.stack([v, 1.0 - np.abs(2 * v - 1), 1.0 - v], axis=-1)
+    buf = io.BytesIO()
+    Image.fromarray(np.uint8(rgb * 255)).save(buf, format="PNG")
+    return buf.getvalue()
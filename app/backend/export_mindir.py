@@ -0,0 +1,88 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import mindspore as ms
+import mindspore.nn as nn
+from mindspore import Tensor
+from mindspore.train.serialization import load_checkpoint, load_param_into_net
+
+import mobilenet_ms as mn
+
+num_class = 12
+
+
+def mindir_path(ckpt_path):
+    return os.path.splitext(ckpt_path)[0] + ".mindir"
+
+
+def export(ckpt_path, out_path=None, batch_size=1, image_size=224, dynamic_batch=True):
+    """Compile a checkpoint into a self-contained MindIR graph with weights baked in.
+
+    The batch dimension is variable by default so batched endpoints
+    (/predict_batch, /predict_tiled) and evaluate.py can use the graph.
+    """
+    net = mn.mobilenet_v2_for_checkpoint(num_class, ckpt_path)
+    load_param_into_net(net, load_checkpoint(ckpt_path))
+    net.set_train(False)
+    if dynamic_batch:
+        example = Tensor(shape=[None, 3, image_size, image_size], dtype=ms.float32)
+    else:
+        example = Tensor(np.zeros((batch_size, 3, image_size, image_size), dtype=np.float32))
+    out_path = out_path or mindir_path(ckpt_path)
+    # ms.export appends the extension itself
+    ms.export(net, example, file_name=os.path.splitext(out_path)[0], file_format="MINDIR")
+    return out_path
+
+
+def load_mindir(path):
+    return nn.GraphCell(ms.load(path))
+
+
+# --- Comparison ---
+def _bench(name, load_fn, batch_size, runs):
+    start = time.perf_counter()
+    net = load_fn()
+    startup = time.perf_counter() - start
+
+    x = Tensor(np.random.rand(batch_size, 3, 224, 224).astype(np.float32))
+    start = time.perf_counter()
+    net(x).asnumpy()
+    first = time.perf_counter() - start
+
+    for _ in range(5):
+        net(x).asnumpy()
+    start = time.perf_counter()
+    for _ in range(runs):
+        net(x).asnumpy()
+    throughput = runs * batch_size / (time.perf_counter() - start)
+    print(f"{name:<22}{startup * 1000:>12.1f}{first * 1000:>14.1f}{throughput:>16.1f}")
+
+
+def compare(ckpt_path, mindir, batch_size=1, runs=50):
+    def from_ckpt():
+        net = mn.mobilenet_v2_for_checkpoint(num_class, ckpt_path)
+        load_param_into_net(net, load_checkpoint(ckpt_path))
+        net.set_train(False)
+        return net
+
+    print(f"\n{'path':<22}{'startup ms':>12}{'first call ms':>14}{'images/sec':>16}")
+    _bench("load_model (.ckpt)", from_ckpt, batch_size, runs)
+    _bench("MindIR GraphCell", lambda: load_mindir(mindir), batch_size, runs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a checkpoint to MindIR and compare serving paths.")
+    parser.add_argument("--ckpt", default="ckpt/mobilenet_v2-25_74.ckpt")
+    parser.add_argument("--out", default=None, help="defaults to the checkpoint path with .mindir")
+    parser.add_argument("--batch-size", type=int, default=1, help="batch for --compare, and for --fixed-batch exports")
+    parser.add_argument("--fixed-batch", action="store_true",
+                        help="export with a fixed batch of --batch-size instead of a variable batch dimension")
+    parser.add_argument("--compare", action="store_true", help="benchmark against the .ckpt load path")
+    args = parser.parse_args()
+
+    out = export(args.ckpt, args.out, args.batch_size, dynamic_batch=not args.fixed_batch)
+    print(f"Exported {args.ckpt} -> {out}")
+    if args.compare:
+        compare(args.ckpt, out, batch_size=args.batch_size)
@@ -0,0 +1,262 @@
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import random
+import socket
+import sys
+import time
+
+import numpy as np
+
+from embedding_index import list_images
+
+rock_classes = [
+    "Basalt", "Chert", "Coal", "Gneiss", "Granite",
+    "Limestone", "Marble", "Obsidian", "Pumice",
+    "Sandstone", "Slate", "Travertine"
+]
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+GOLDEN_DIR = "golden"
+
+
+def _sha1(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def file_sha1(path):
+    with open(path, "rb") as f:
+        return _sha1(f.read())
+
+
+# --- Engines ---
+# An engine factory takes the checkpoint path and returns a function mapping
+# a list of image bytes to an (N, num_classes) array of probabilities.
+def reference_engine(ckpt_path):
+    """Today's serving path: preprocess_image + net(...) + softmax, one image at a time."""
+    import mindspore as ms
+    from mindspore import Tensor, ops
+    from evaluate import load_net
+    from preprocess import preprocess_array
+    net = load_net(ckpt_path)
+    softmax = ops.Softmax()
+
+    def run(images):
+        return np.stack([softmax(net(Tensor(preprocess_array(b), ms.float32))).asnumpy()[0] for b in images])
+    return run
+
+
+def batched_engine(ckpt_path, batch_size=16):
+    import mindspore as ms
+    from mindspore import Tensor, ops
+    from evaluate import load_net
+    from preprocess import preprocess_array
+    net = load_net(ckpt_path)
+    softmax = ops.Softmax()
+
+    def run(images):
+        x = np.concatenate([preprocess_array(b) for b in images])
+        return np.concatenate([softmax(net(Tensor(x[i:i + batch_size], ms.float32))).asnumpy()
+                               for i in range(0, len(x), batch_size)])
+    return run
+
+
+def mindir_engine(ckpt_path):
+    """The compiled graph from export_mindir.py next to the checkpoint."""
+    import export_mindir
+    return reference_engine(export_mindir.mindir_path(ckpt_path))
+
+
+ENGINES = {
+    "reference": reference_engine,
+    "batched": batched_engine,
+    "mindir": mindir_engine,
+}
+
+
+def get_engine(spec, ckpt_path):
+    """A registered name, "ckpt:<path>" for another checkpoint, or "<module>:<factory>"."""
+    if spec in ENGINES:
+        return ENGINES[spec](ckpt_path)
+    kind, _, target = spec.partition(":")
+    if kind == "ckpt":
+        return reference_engine(target)
+    if target:
+        return getattr(importlib.import_module(kind), target)(ckpt_path)
+    raise ValueError(f"Unknown engine: {spec}")
+
+
+# --- Corpus ---
+def select_images(rock_test, val, per_class=5, seed=0):
+    """All of Rock Test (unlabelled) plus a fixed per-class sample of rocks_val."""
+    items = []
+    if rock_test and os.path.isdir(rock_test):
+        items += [(os.path.join(rock_test, n), None) for n in sorted(os.listdir(rock_test))
+                  if n.lower().endswith(IMAGE_EXTENSIONS)]
+    if val and os.path.isdir(val):
+        by_class = {}
+        for path, label in list_images(val):
+            if label in rock_classes:
+                by_class.setdefault(label, []).append(path)
+        rng = random.Random(seed)
+        for label in rock_classes:
+            paths = sorted(by_class.get(label, []))
+            items += [(p, label) for p in sorted(rng.sample(paths, min(per_class, len(paths))))]
+    return items
+
+
+def _time_engine(engine, images, repeats):
+    engine(images[:1])  # warmup / graph compile
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        probs = engine(images)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return probs, best * 1000 / len(images)
+
+
+def build(ckpt_path, rock_test, val, out_dir=GOLDEN_DIR, per_class=5, repeats=3):
+    items = select_images(rock_test, val, per_class)
+    images = []
+    for path, _ in items:
+        with open(path, "rb") as f:
+            images.append(f.read())
+    engine = reference_engine(ckpt_path)
+    # per-image reference timings, batch size 1 as served
+    engine(images[:1])
+    probs, times = [], []
+    for image in images:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            p = engine([image])[0]
+            best = min(best, time.perf_counter() - start)
+        probs.append(p)
+        times.append(best * 1000)
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "probabilities.npy"), np.stack(probs).astype(np.float32))
+    corpus = {
+        "checkpoint": ckpt_path,
+        "checkpoint_sha1": file_sha1(ckpt_path),
+        "host": socket.gethostname(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "reference_ms_per_image": float(np.mean(times)),
+        "entries": [{"path": p, "sha1": _sha1(b), "label": l, "reference_ms": t}
+                    for (p, l), b, t in zip(items, images, times)],
+    }
+    with open(os.path.join(out_dir, "corpus.json"), "w", encoding="utf-8") as f:
+        json.dump(corpus, f, indent=2)
+    return corpus
+
+
+def load(corpus_dir=GOLDEN_DIR):
+    with open(os.path.join(corpus_dir, "corpus.json"), "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+    return corpus, np.load(os.path.join(corpus_dir, "probabilities.npy"))
+
+
+# --- Harness ---
+def check(engine_spec, corpus_dir=GOLDEN_DIR, ckpt_path=None, min_agreement=1.0, max_deviation=1e-3, repeats=3):
+    """Run an engine over the corpus and compare it with the stored reference outputs."""
+    corpus, reference = load(corpus_dir)
+    ckpt_path = ckpt_path or corpus["checkpoint"]
+    warnings = []
+    if file_sha1(ckpt_path) != corpus["checkpoint_sha1"]:
+        warnings.append("checkpoint differs from the one the corpus was built with")
+    if corpus["host"] != socket.gethostname():
+        warnings.append(f"reference timings come from {corpus['host']}; speedup is not comparable")
+
+    images = []
+    for e in corpus["entries"]:
+        with open(e["path"], "rb") as f:
+            data = f.read()
+        if _sha1(data) != e["sha1"]:
+            warnings.append(f"{e['path']} changed since the corpus was built")
+        images.append(data)
+
+    probs, ms_per_image = _time_engine(get_engine(engine_spec, ckpt_path), images, repeats)
+    deviation = np.abs(probs - reference)
+    agree = np.argmax(probs, axis=1) == np.argmax(reference, axis=1)
+    labelled = [(i, rock_classes.index(e["label"])) for i, e in enumerate(corpus["entries"]) if e["label"]]
+    report = {
+        "engine": engine_spec,
+        "images": len(images),
+        "top1_agreement": float(agree.mean()),
+        "max_probability_deviation": float(deviation.max()),
+        "mean_probability_deviation": float(deviation.mean()),
+        "label_accuracy": float(np.mean([np.argmax(probs[i]) == l for i, l in labelled])) if labelled else None,
+        "reference_label_accuracy": float(np.mean([np.argmax(reference[i]) == l for i, l in labelled])) if labelled else None,
+        "ms_per_image": ms_per_image,
+        "reference_ms_per_image": corpus["reference_ms_per_image"],
+        "speedup": corpus["reference_ms_per_image"] / ms_per_image,
+        "disagreements": [
+            {"path": corpus["entries"][i]["path"],
+             "reference": rock_classes[int(np.argmax(reference[i]))],
+             "engine": rock_classes[int(np.argmax(probs[i]))]}
+            for i in np.flatnonzero(~agree)
+        ],
+        "warnings": warnings,
+    }
+    failures = []
+    if report["top1_agreement"] < min_agreement:
+        failures.append(f"top-1 agreement {report['top1_agreement']:.4f} < {min_agreement}")
+    if report["max_probability_deviation"] > max_deviation:
+        failures.append(f"max probability deviation {report['max_probability_deviation']:.2e} > {max_deviation:.0e}")
+    report["failures"] = failures
+    report["passed"] = not failures
+    return report
+
+
+def print_report(r):
+    print(f"engine:                 {r['engine']} on {r['images']} images")
+    print(f"top-1 agreement:        {r['top1_agreement']:.4f}")
+    print(f"max prob deviation:     {r['max_probability_deviation']:.2e} (mean {r['mean_probability_deviation']:.2e})")
+    if r["label_accuracy"] is not None:
+        print(f"val accuracy:           {r['label_accuracy']:.4f} (reference {r['reference_label_accuracy']:.4f})")
+    print(f"ms/image:               {r['ms_per_image']:.2f} (reference {r['reference_ms_per_image']:.2f}, "
+          f"speedup {r['speedup']:.2f}x)")
+    for d in r["disagreements"]:
+        print(f"  differs: {d['path']}: {d['reference']} -> {d['engine']}")
+    for w in r["warnings"]:
+        print(f"warning: {w}")
+    print("PASS" if r["passed"] else "FAIL: " + "; ".join(r["failures"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Golden-output corpus and regression harness for inference engines.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="record reference outputs and timings")
+    p.add_argument("--ckpt", default="ckpt/mobilenet_v2-25_74.ckpt")
+    p.add_argument("--rock-test", default="../frontend/Rock Test")
+    p.add_argument("--val", default="../../dataset/rocks_val")
+    p.add_argument("--per-class", type=int, default=5, help="rocks_val images sampled per class")
+    p.add_argument("--out", default=GOLDEN_DIR)
+
+    p = sub.add_parser("check", help="compare an engine against the corpus; exits 1 on failure")
+    p.add_argument("engine", nargs="+", help=f"{', '.join(ENGINES)}, ckpt:<path> or <module>:<factory>")
+    p.add_argument("--corpus", default=GOLDEN_DIR)
+    p.add_argument("--ckpt", default=None, help="defaults to the corpus checkpoint")
+    p.add_argument("--min-agreement", type=float, default=1.0)
+    p.add_argument("--max-deviation", type=float, default=1e-3)
+    p.add_argument("--json", default=None, help="also write the reports to this file")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        corpus = build(args.ckpt, args.rock_test, args.val, args.out, args.per_class)
+        print(f"Golden corpus of {len(corpus['entries'])} images written to {args.out}/ "
+              f"({corpus['reference_ms_per_image']:.2f} ms/image)")
+    else:
+        reports = []
+        for spec in args.engine:
+            reports.append(check(spec, args.corpus, args.ckpt, args.min_agreement, args.max_deviation))
+            print_report(reports[-1])
+            print()
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(reports, f, indent=2)
+        if not all(r["passed"] for r in reports):
+            sys.exit(1)
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from mindspore import Tensor, ops
+
+import mobilenet_ms as mn
+
+
+def backbone_fingerprint(arrays, names, arch_config):
+    """Hash of the backbone weights (and the architecture they belong to)."""
+    h = hashlib.sha1(json.dumps(arch_config, sort_keys=True).encode())
+    for name in names:
+        h.update(name.encode())
+        h.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return h.hexdigest()
+
+
+def class_names_path(ckpt_path):
+    return os.path.splitext(ckpt_path)[0] + ".classes.txt"
+
+
+def class_names_for(ckpt_path, num_classes, default):
+    """Class names from a <ckpt>.classes.txt sidecar (one per line), else the default list."""
+    path = class_names_path(ckpt_path)
+    if os.path.isfile(path):
+        with open(path, "r", encoding="utf-8") as f:
+            names = [line.strip() for line in f if line.strip()]
+        if len(names) == num_classes:
+            return names
+    if num_classes == len(default):
+        return list(default)
+    return [f"class_{i}" for i in range(num_classes)]
+
+
+class SharedBackbone:
+    """One resident MobileNetV2Backbone with several classifier heads attached.
+
+    Checkpoints fine-tuned from the same base differ only in head.dense, so
+    their heads can share a single backbone: predict() runs the backbone
+    once and applies every requested head to the pooled features.
+    """
+
+    def __init__(self, net, ckpt_path, param_dict, class_names):
+        self.backbone = net.backbone
+        self.arch_config = mn.load_arch_config(ckpt_path)
+        self.names = sorted(p.name for p in net.backbone.get_parameters())
+        self.dense_names = (net.head.dense.weight.name, net.head.dense.bias.name)
+        self.fingerprint = backbone_fingerprint(
+            {n: param_dict[n].asnumpy() for n in self.names}, self.names, self.arch_config)
+        self.heads = {ckpt_path: (net.head, list(class_names))}
+        self.pool = mn.GlobalAvgPooling()
+        self.softmax = ops.Softmax()
+
+    def matches(self, ckpt_path, param_dict):
+        if mn.load_arch_config(ckpt_path) != self.arch_config:
+            return False
+        if any(n not in param_dict for n in self.names + list(self.dense_names)):
+            return False
+        arrays = {n: param_dict[n].asnumpy() for n in self.names}
+        return backbone_fingerprint(arrays, self.names, self.arch_config) == self.fingerprint
+
+    def attach(self, ckpt_path, param_dict, default_classes):
+        """Build a head from the checkpoint's dense weights; the caller checks matches() first."""
+        weight = param_dict[self.dense_names[0]].asnumpy()
+        bias = param_dict[self.dense_names[1]].asnumpy()
+        head = mn.MobileNetV2Head(self.backbone.out_channels, weight.shape[0])
+        head.dense.weight.set_data(Tensor(weight))
+        head.dense.bias.set_data(Tensor(bias))
+        head.set_train(False)
+        self.heads[ckpt_path] = (head, class_names_for(ckpt_path, weight.shape[0], default_classes))
+        return head
+
+    def detach(self, ckpt_path):
+        return self.heads.pop(ckpt_path, None) is not None
+
+    def predict(self, x, names=None):
+        """{ckpt path: (probabilities, class names)} for each head, from one backbone pass."""
+        names = list(self.heads) if names is None else names
+        pooled = self.pool(self.backbone(x))
+        results = {}
+        for name in names:
+            head, class_names = self.heads[name]
+            results[name] = (self.softmax(head.dense(pooled)).asnumpy(), class_names)
+        return results
+
+    def stats(self):
+        return {
+            "backbone_fingerprint": self.fingerprint,
+            "heads": {name: {"num_classes": len(classes), "classes": classes}
+                      for name, (_, classes) in self.heads.items()},
+        }
@@ -0,0 +1,167 @@
+import gc
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict, deque
+
+
+def rss_bytes():
+    """Resident set size of this process, or None if it cannot be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def live_objects(type_names):
+    """Count live gc-tracked instances of each named class, subclasses included."""
+    wanted = set(type_names)
+    counts = Counter()
+    for obj in gc.get_objects():
+        for cls in type(obj).__mro__:
+            if cls.__name__ in wanted:
+                counts[cls.__name__] += 1
+    return {name: counts.get(name, 0) for name in type_names}
+
+
+# --- tracemalloc ---
+class AllocationTracker:
+    """tracemalloc top allocators and diffs between named snapshots."""
+
+    def __init__(self, max_snapshots=4):
+        self.max_snapshots = max_snapshots
+        self.snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=10):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self):
+        tracemalloc.stop()
+        with self._lock:
+            self.snapshots.clear()
+
+    def _snapshot(self):
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running.")
+        # leave out tracemalloc's own bookkeeping
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+
+    def snapshot(self, name=None):
+        snap = self._snapshot()
+        name = name or time.strftime("%H%M%S")
+        with self._lock:
+            self.snapshots[name] = snap
+            while len(self.snapshots) > self.max_snapshots:
+                self.snapshots.popitem(last=False)
+        return name
+
+    def top(self, limit=20, group_by="lineno"):
+        stats = self._snapshot().statistics(group_by)
+        return [_stat_dict(s) for s in stats[:limit]]
+
+    def diff(self, old, new=None, limit=20, group_by="lineno"):
+        """Largest growth from snapshot `old` to snapshot `new` (or to right now)."""
+        with self._lock:
+            if old not in self.snapshots or (new is not None and new not in self.snapshots):
+                raise KeyError("Unknown snapshot.")
+            old_snap = self.snapshots[old]
+            new_snap = self.snapshots[new] if new is not None else None
+        new_snap = new_snap or self._snapshot()
+        stats = new_snap.compare_to(old_snap, group_by)
+        return [{**_stat_dict(s), "size_diff_kb": s.size_diff / 1024, "count_diff": s.count_diff}
+                for s in stats[:limit]]
+
+    def stats(self):
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {"tracing": self.tracing, "traced_mb": current / 2 ** 20, "peak_traced_mb": peak / 2 ** 20,
+                "snapshots": list(self.snapshots)}
+
+
+def _stat_dict(stat):
+    frame = stat.traceback[0]
+    return {"location": f"{frame.filename}:{frame.lineno}", "size_kb": stat.size / 1024, "count": stat.count}
+
+
+# --- RSS history / watchdog ---
+class MemoryWatchdog:
+    """Sample RSS in the background and react when it crosses limit_mb.
+
+    action "shed" makes `shedding` true so the server refuses new work
+    until RSS drops below 90% of the limit; "recycle" sends this process
+    SIGTERM for a graceful shutdown, leaving the restart to the supervisor
+    (e.g. router.py --spawn). A gc.collect() is always tried first.
+    """
+
+    def __init__(self, interval=5.0, history=720, limit_mb=None, action="shed"):
+        self.interval = interval
+        self.limit_mb = limit_mb
+        self.action = action
+        self.history = deque(maxlen=history)
+        self.shedding = False
+        self.triggered = 0
+        self.started = time.time()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-watchdog", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = rss_bytes()
+            if rss is None:
+                continue
+            rss_mb = rss / 2 ** 20
+            self.history.append((time.time(), rss_mb))
+            if self.limit_mb:
+                self._check(rss_mb)
+
+    def _check(self, rss_mb):
+        if rss_mb > self.limit_mb:
+            if self.shedding:
+                return
+            gc.collect()
+            rss_mb = (rss_bytes() or 0) / 2 ** 20
+            if rss_mb <= self.limit_mb:
+                return
+            self.triggered += 1
+            print(f"Memory watchdog: RSS {rss_mb:.0f} MB is over {self.limit_mb:.0f} MB ({self.action})",
+                  file=sys.stderr)
+            if self.action == "recycle":
+                os.kill(os.getpid(), signal.SIGTERM)
+            else:
+                self.shedding = True
+        elif self.shedding and rss_mb < 0.9 * self.limit_mb:
+            self.shedding = False
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self, points=120):
+        history = list(self.history)[-points:]
+        return {
+            "rss_mb": (rss_bytes() or 0) / 2 ** 20,
+            "limit_mb": self.limit_mb,
+            "action": self.action,
+            "shedding": self.shedding,
+            "triggered": self.triggered,
+            "uptime_seconds": time.time() - self.started,
+            "peak_rss_mb": max((m for _, m in self.history), default=None),
+            "history": [{"time": t, "rss_mb": round(m, 1)} for t, m in history],
+        }
@@ -1,3 +1,5 @@
+import json
+import os
 import numpy as np
 import mindspore as ms
 import mindspore.nn as nn
@@ -45,11 +47,13 @@ class ConvBNReLU(nn.Cell):
 
 class InvertedResidual(nn.Cell):
 
-    def __init__(self, inp, oup, stride, expand_ratio):
+    def __init__(self, inp, oup, stride, expand_ratio, hidden_dim=None):
         super(InvertedResidual, self).__init__()
         assert stride in [1, 2]
 
-        hidden_dim = int(round(inp * expand_ratio))
+        # hidden_dim overrides the expanded width, e.g. for channel-pruned models
+        if hidden_dim is None or expand_ratio == 1:
+            hidden_dim = int(round(inp * expand_ratio))
         self.use_res_connect = stride == 1 and inp == oup
 
         layers = []
@@ -78,7 +82,7 @@ class InvertedResidual(nn.Cell):
 class MobileNetV2Backbone(nn.Cell):
 
     def __init__(self, width_mult=1., inverted_residual_setting=None, round_nearest=8,
-                 input_channel=32, last_channel=1280):
+                 input_channel=32, last_channel=1280, hidden_dims=None):
         super(MobileNetV2Backbone, self).__init__()
         block = InvertedResidual
         # setting of inverted residual blocks
@@ -100,12 +104,15 @@ class MobileNetV2Backbone(nn.Cell):
         self.out_channels = _make_divisible(last_channel * max(1.0, width_mult), round_nearest)
         features = [ConvBNReLU(3, input_channel, stride=2)]
         # building inverted residual blocks
+        block_idx = 0
         for t, c, n, s in self.cfgs:
             output_channel = _make_divisible(c * width_mult, round_nearest)
             for i in range(n):
                 stride = s if i == 0 else 1
-                features.append(block(input_channel, output_channel, stride, expand_ratio=t))
+                hidden_dim = hidden_dims[block_idx] if hidden_dims is not None else None
+                features.append(block(input_channel, output_channel, stride, expand_ratio=t, hidden_dim=hidden_dim))
                 input_channel = output_channel
+                block_idx += 1
         # building last several layers
         features.append(ConvBNReLU(input_channel, self.out_channels, kernel_size=1))
         # make it nn.CellList
@@ -186,8 +193,26 @@ class MobileNetV2Combine(nn.Cell):
         x = self.head(x)
         return x
 
-def mobilenet_v2(num_classes):
-    backbone_net = MobileNetV2Backbone()
+def mobilenet_v2(num_classes, **backbone_config):
+    backbone_net = MobileNetV2Backbone(**backbone_config)
     head_net = MobileNetV2Head(backbone_net.out_channels,num_classes)
     return MobileNetV2Combine(backbone_net, head_net)
 
+def arch_config_path(ckpt_path):
+    return os.path.splitext(ckpt_path)[0] + ".json"
+
+def load_arch_config(ckpt_path):
+    """Backbone keyword arguments stored next to a checkpoint, or {} for the default network."""
+    path = arch_config_path(ckpt_path)
+    if not os.path.isfile(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_arch_config(ckpt_path, config):
+    with open(arch_config_path(ckpt_path), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+def mobilenet_v2_for_checkpoint(num_classes, ckpt_path):
+    return mobilenet_v2(num_classes, **load_arch_config(ckpt_path))
+
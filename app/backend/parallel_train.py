@@ -0,0 +1,259 @@
+import argparse
+import multiprocessing as mp
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+rock_classes = [
+    "Basalt", "Chert", "Coal", "Gneiss", "Granite",
+    "Limestone", "Marble", "Obsidian", "Pumice",
+    "Sandstone", "Slate", "Travertine"
+]
+class_indexing = {name: idx for idx, name in enumerate(rock_classes)}
+WARMUP_STEPS = 3  # excluded from samples/sec: the first steps compile kernels
+BARRIER_TIMEOUT = 600.0
+
+
+def create_shard(data_path, num_shards, shard_id, batch_size, workers):
+    """One shard of the training ImageFolderDataset, with the same augmentation as RockTraining."""
+    import mindspore.dataset as ds
+    import mindspore.dataset.vision.c_transforms as CV
+    data_set = ds.ImageFolderDataset(data_path, num_parallel_workers=workers, shuffle=True,
+                                     class_indexing=class_indexing, num_shards=num_shards, shard_id=shard_id)
+    mean = [0.485 * 255, 0.456 * 255, 0.406 * 255]
+    std = [0.229 * 255, 0.224 * 255, 0.225 * 255]
+    trans = [
+        CV.RandomCropDecodeResize(224, scale=(0.08, 1.0), ratio=(0.75, 1.333)),
+        CV.RandomHorizontalFlip(prob=0.5),
+        CV.Normalize(mean=mean, std=std),
+        CV.HWC2CHW()
+    ]
+    data_set = data_set.map(operations=trans, input_columns="image", num_parallel_workers=workers)
+    # repeat forever: every worker takes exactly the same number of steps, whatever its shard size
+    return data_set.batch(batch_size, drop_remainder=True).repeat()
+
+
+def count_images(data_path):
+    return sum(len([f for f in os.listdir(os.path.join(data_path, c))
+                    if f.lower().endswith((".jpg", ".jpeg", ".png", ".bmp"))])
+               for c in rock_classes if os.path.isdir(os.path.join(data_path, c)))
+
+
+def build_net(init_ckpt, seed):
+    import mindspore as ms
+    from mindspore.train.serialization import load_checkpoint, load_param_into_net
+    import mobilenet_ms as mn
+    np.random.seed(seed)
+    ms.set_seed(seed)
+    if init_ckpt:
+        net = mn.mobilenet_v2_for_checkpoint(len(rock_classes), init_ckpt)
+        load_param_into_net(net, load_checkpoint(init_ckpt))
+        return net
+    return mn.mobilenet_v2(len(rock_classes))
+
+
+# --- Gradient averaging in shared memory ---
+class SharedAllReduce:
+    """Average flat float32 vectors across workers through one shared block.
+
+    Every worker writes its vector into its own row, then averages one
+    contiguous slice of all rows into the output (reduce-scatter), so the
+    reduction work is split evenly. Two barriers per call keep the rows
+    and the output from being overwritten while someone still reads them.
+    """
+
+    def __init__(self, shm_name, world, rank, size, barrier):
+        self.shm = shared_memory.SharedMemory(name=shm_name)
+        self.rows = np.ndarray((world, size), dtype=np.float32, buffer=self.shm.buf)
+        self.out = np.ndarray((size,), dtype=np.float32, buffer=self.shm.buf, offset=world * size * 4)
+        self.world = world
+        self.rank = rank
+        self.barrier = barrier
+        bounds = np.linspace(0, size, world + 1).astype(np.int64)
+        self.lo, self.hi = bounds[rank], bounds[rank + 1]
+
+    def mean(self, flat):
+        n = len(flat)
+        self.rows[self.rank, :n] = flat
+        self.barrier.wait(BARRIER_TIMEOUT)
+        lo, hi = min(self.lo, n), min(self.hi, n)
+        if hi > lo:
+            np.mean(self.rows[:, lo:hi], axis=0, out=self.out[lo:hi])
+        self.barrier.wait(BARRIER_TIMEOUT)
+        return self.out[:n].copy()
+
+    def broadcast(self, flat):
+        """Rank 0's vector to everyone (used for the initial weights)."""
+        n = len(flat)
+        if self.rank == 0:
+            self.out[:n] = flat
+        self.barrier.wait(BARRIER_TIMEOUT)
+        result = self.out[:n].copy()
+        self.barrier.wait(BARRIER_TIMEOUT)
+        return result
+
+    def close(self):
+        del self.rows, self.out
+        self.shm.close()
+
+
+def _flatten(arrays):
+    return np.concatenate([np.asarray(a, dtype=np.float32).ravel() for a in arrays])
+
+
+def _assign(params, flat):
+    from mindspore import Tensor
+    offset = 0
+    for p in params:
+        size = int(np.prod(p.shape))
+        p.set_data(Tensor(flat[offset:offset + size].reshape(p.shape)))
+        offset += size
+
+
+# --- Worker ---
+def train_worker(rank, world, args, shm_name, size, barrier, results):
+    import autotune as at
+    # split the cores between workers instead of letting each one grab all of them
+    threads = max(1, (os.cpu_count() or 1) // world)
+    at.apply_threads(threads)
+    import mindspore as ms
+    import mindspore.nn as nn
+    from mindspore import Tensor
+    from mindspore.train.serialization import save_checkpoint
+    import mobilenet_ms as mn
+
+    net = build_net(args.init, args.seed)
+    reducer = SharedAllReduce(shm_name, world, rank, size, barrier)
+    _assign(net.get_parameters(), reducer.broadcast(_flatten(p.asnumpy() for p in net.get_parameters())))
+
+    steps = args.steps or args.epochs * max(1, args.images // (world * args.batch_size))
+    lr = nn.cosine_decay_lr(0.0, args.lr, steps, steps, 1) if steps > 1 else [args.lr]
+    optimizer = nn.Momentum(net.trainable_params(), learning_rate=lr, momentum=0.9, weight_decay=4e-5)
+    loss_fn = nn.SoftmaxCrossEntropyWithLogits(sparse=True, reduction="mean")
+
+    def forward(x, y):
+        return loss_fn(net(x), y)
+
+    grad_fn = ms.value_and_grad(forward, None, optimizer.parameters)
+    shapes = [p.shape for p in optimizer.parameters]
+    data_set = create_shard(args.data, world, rank, args.batch_size, max(1, threads // 2))
+    iterator = data_set.create_tuple_iterator()
+    net.set_train(True)
+
+    losses = []
+    start = None
+    for step in range(steps):
+        if step == min(WARMUP_STEPS, steps - 1):
+            start = time.perf_counter()
+        x, y = next(iterator)
+        loss, grads = grad_fn(x, y.astype(ms.int32))
+        flat = reducer.mean(_flatten(g.asnumpy() for g in grads))
+        offset = 0
+        averaged = []
+        for shape in shapes:
+            n = int(np.prod(shape))
+            averaged.append(Tensor(flat[offset:offset + n].reshape(shape)))
+            offset += n
+        optimizer(tuple(averaged))
+        losses.append(float(loss.asnumpy()))
+        if rank == 0 and ((step + 1) % args.log_every == 0 or step == steps - 1):
+            print(f"step {step + 1}/{steps}  loss {np.mean(losses[-args.log_every:]):.4f}")
+    elapsed = time.perf_counter() - start
+    measured = steps - min(WARMUP_STEPS, steps - 1)
+
+    # BatchNorm running statistics were collected per shard; average them too
+    stats = [p for p in net.get_parameters() if not p.requires_grad]
+    _assign(stats, reducer.mean(_flatten(p.asnumpy() for p in stats)))
+
+    if rank == 0:
+        if args.out:
+            os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+            save_checkpoint(net, args.out)
+            arch_config = mn.load_arch_config(args.init) if args.init else {}
+            if arch_config:
+                mn.save_arch_config(args.out, arch_config)
+        results.put({
+            "workers": world,
+            "threads_per_worker": threads,
+            "steps": steps,
+            "samples_per_sec": world * args.batch_size * measured / elapsed,
+            "final_loss": float(np.mean(losses[-args.log_every:])),
+        })
+    reducer.close()
+
+
+# --- Launcher ---
+def launch(world, args):
+    """Run `world` worker processes on this machine; returns rank 0's summary."""
+    net = build_net(args.init, args.seed)
+    size = max(sum(int(np.prod(p.shape)) for p in net.get_parameters()), 1)
+    del net
+    shm = shared_memory.SharedMemory(create=True, size=(world + 1) * size * 4)
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(world)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=train_worker, name=f"train-{r}",
+                             args=(r, world, args, shm.name, size, barrier, results))
+                 for r in range(world)]
+    try:
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        failed = [p.name for p in processes if p.exitcode != 0]
+        if failed:
+            raise RuntimeError(f"Workers failed: {', '.join(failed)}")
+        return results.get(timeout=5)
+    finally:
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+        shm.close()
+        shm.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Data-parallel MobileNetV2 training with one process per shard.")
+    parser.add_argument("--data", default="../../dataset/rocks_train")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--init", default=None, help="start from this checkpoint instead of random weights")
+    parser.add_argument("--out", default="ckpt/mobilenet_v2-parallel.ckpt")
+    parser.add_argument("--epochs", type=int, default=25)
+    parser.add_argument("--steps", type=int, default=None, help="fixed number of steps instead of --epochs")
+    parser.add_argument("--batch-size", type=int, default=32, help="per worker")
+    parser.add_argument("--lr", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-every", type=int, default=10)
+    parser.add_argument("--scaling", default=None,
+                        help="comma-separated worker counts: only measure samples/sec, e.g. 1,2,4,8")
+    args = parser.parse_args()
+    args.images = count_images(args.data)
+
+    if args.scaling:
+        args.out = None
+        args.steps = args.steps or 20
+        rows = []
+        for world in [int(w) for w in args.scaling.split(",")]:
+            result = launch(world, args)
+            rows.append(result)
+            print(f"{world} workers: {result['samples_per_sec']:.1f} samples/sec")
+        base = rows[0]["samples_per_sec"] / rows[0]["workers"]
+        print(f"\n{'workers':>8}{'threads':>9}{'samples/s':>12}{'speedup':>10}{'efficiency':>12}")
+        for r in rows:
+            speedup = r["samples_per_sec"] / rows[0]["samples_per_sec"]
+            efficiency = r["samples_per_sec"] / (base * r["workers"])
+            print(f"{r['workers']:>8}{r['threads_per_worker']:>9}{r['samples_per_sec']:>12.1f}"
+                  f"{speedup:>10.2f}{efficiency:>12.0%}")
+        return
+
+    print(f"Training on {args.images} images with {args.workers} workers "
+          f"(global batch {args.workers * args.batch_size})")
+    result = launch(args.workers, args)
+    print(f"\n{result['samples_per_sec']:.1f} samples/sec, final loss {result['final_loss']:.4f}")
+    print(f"Saved checkpoint to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
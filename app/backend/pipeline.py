@@ -0,0 +1,174 @@
+import asyncio
+import itertools
+import multiprocessing as mp
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from preprocess import preprocess_array, IMAGE_SIZE
+
+TENSOR_SHAPE = (3, IMAGE_SIZE, IMAGE_SIZE)
+
+
+def _decode_worker(shm_name, slots, jobs, done, free, busy, index):
+    """Decode + normalize images straight into ring-buffer slots."""
+    # spawned workers share the parent's resource tracker, so attaching does not take ownership
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray((slots,) + TENSOR_SHAPE, dtype=np.float32, buffer=shm.buf)
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, image_bytes = job
+        slot = free.get()
+        start = time.perf_counter()
+        try:
+            ring[slot] = preprocess_array(image_bytes)[0]
+            error = None
+        except Exception as e:
+            free.put(slot)
+            slot, error = None, f"Invalid image: {e}"
+        with busy.get_lock():
+            busy[index] += time.perf_counter() - start
+        done.put((job_id, slot, error))
+    del ring
+    shm.close()
+
+
+class DecodePipeline:
+    """Decode stage in worker processes, handing tensors over in shared memory.
+
+    Workers write normalized float32 tensors into a fixed ring of slots in one
+    SharedMemory block and only send the slot index back. The inference stage
+    reads a slot through a zero-copy numpy view and releases it afterwards,
+    so tensors are never pickled between processes.
+    """
+
+    def __init__(self, workers=2, slots=None, inference_workers=1):
+        self.workers = workers
+        self.inference_workers = inference_workers
+        self.slots = slots or workers * 4
+        size = self.slots * int(np.prod(TENSOR_SHAPE)) * 4
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.ring = np.ndarray((self.slots,) + TENSOR_SHAPE, dtype=np.float32, buffer=self.shm.buf)
+
+        ctx = mp.get_context("spawn")
+        self.jobs = ctx.Queue()
+        self.done = ctx.Queue()
+        self.free = ctx.Queue()
+        for i in range(self.slots):
+            self.free.put(i)
+        self.decode_busy = ctx.Array("d", workers)
+        self.processes = [
+            ctx.Process(target=_decode_worker, name=f"decode-{i}", daemon=True,
+                        args=(self.shm.name, self.slots, self.jobs, self.done, self.free, self.decode_busy, i))
+            for i in range(workers)
+        ]
+        for p in self.processes:
+            p.start()
+
+        self.started = time.perf_counter()
+        self.inference_busy = 0.0
+        self.decoded = 0
+        self.inferred = 0
+        self._in_flight = 0
+        self._futures = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._collector = threading.Thread(target=self._collect, name="decode-collector", daemon=True)
+        self._collector.start()
+
+    # --- Decode stage ---
+    async def decode(self, image_bytes):
+        """Queue an image for decoding and return the slot holding its tensor."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        job_id = next(self._ids)
+        with self._lock:
+            self._futures[job_id] = (loop, future)
+            self._in_flight += 1
+        self.jobs.put((job_id, image_bytes))
+        return await future
+
+    def _collect(self):
+        while True:
+            item = self.done.get()
+            if item is None:
+                return
+            job_id, slot, error = item
+            with self._lock:
+                loop, future = self._futures.pop(job_id)
+                self._in_flight -= 1
+                self.decoded += 1
+            loop.call_soon_threadsafe(self._resolve, future, slot, error)
+
+    def _resolve(self, future, slot, error):
+        if future.done():
+            # the caller went away; give the slot back
+            if slot is not None:
+                self.release(slot)
+        elif error is not None:
+            future.set_exception(ValueError(error))
+        else:
+            future.set_result(slot)
+
+    # --- Inference stage ---
+    def view(self, slot):
+        """(1, 3, 224, 224) view of a slot, backed directly by shared memory."""
+        return self.ring[slot:slot + 1]
+
+    def release(self, slot):
+        self.free.put(slot)
+
+    @contextmanager
+    def inference_timer(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.inference_busy += time.perf_counter() - start
+                self.inferred += 1
+
+    # --- Reporting ---
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        busy = list(self.decode_busy[:])
+        with self._lock:
+            in_flight = self._in_flight
+            inference_busy = self.inference_busy
+        decode_util = sum(busy) / (elapsed * self.workers) if elapsed else 0.0
+        inference_util = inference_busy / (elapsed * self.inference_workers) if elapsed else 0.0
+        return {
+            "uptime_s": elapsed,
+            "decode": {
+                "workers": self.workers,
+                "utilization": decode_util,
+                "per_worker_utilization": [b / elapsed for b in busy] if elapsed else [],
+                "completed": self.decoded,
+                "in_flight": in_flight,
+            },
+            "inference": {
+                "workers": self.inference_workers,
+                "utilization": inference_util,
+                "completed": self.inferred,
+            },
+            "ring": {"slots": self.slots},
+            # the busier stage is the bottleneck: add workers there first
+            "bottleneck": "decode" if decode_util > inference_util else "inference",
+        }
+
+    def close(self):
+        for _ in self.processes:
+            self.jobs.put(None)
+        for p in self.processes:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        self.done.put(None)
+        del self.ring
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,17 @@
+import io
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZE = 224
+MEAN = np.array([0.485, 0.456, 0.406])
+STD = np.array([0.229, 0.224, 0.225])
+
+def preprocess_array(image_bytes):
+    """Decode image bytes into a normalized (1, 3, 224, 224) float32 array."""
+    img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    img = img.resize((IMAGE_SIZE, IMAGE_SIZE))
+    img = np.array(img) / 255.0
+    img = (img - MEAN) / STD
+    img = img.transpose(2, 0, 1)
+    img = img[np.newaxis, ...]
+    return img.astype(np.float32)
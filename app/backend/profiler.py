@@ -0,0 +1,97 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+# Leaf functions of threads that are blocked rather than doing work
+IDLE_FUNCTIONS = {"wait", "select", "poll", "epoll", "accept", "_wait_for_tstate_lock"}
+
+# (category, predicate on a frame's module/function) checked from the leaf upwards
+CATEGORIES = [
+    ("json", lambda mod, fn: mod.startswith("json") or fn in ("jsonable_encoder", "dumps", "render")),
+    ("preprocess", lambda mod, fn: fn in ("preprocess_image", "preprocess_array")),
+    ("mindspore", lambda mod, fn: mod.startswith("mindspore")),
+    ("fastapi/uvicorn", lambda mod, fn: mod.split(".")[0] in ("fastapi", "starlette", "uvicorn", "anyio", "h11", "httptools", "websockets")),
+]
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return module, code.co_name
+
+
+def _stack(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+def categorize(stack):
+    if not stack or stack[-1][1] in IDLE_FUNCTIONS:
+        return "idle"
+    for module, function in reversed(stack):
+        for category, match in CATEGORIES:
+            if match(module, function):
+                return category
+    return "other"
+
+
+def sample(seconds=5.0, hz=100, include_idle=False):
+    """Sample the Python stack of every other thread at `hz` for `seconds`.
+
+    Returns (collapsed stack counts, per-category counts, samples taken).
+    Each sample is a single sys._current_frames() call, so the cost on the
+    sampled threads is one GIL hand-off per tick.
+    """
+    interval = 1.0 / hz
+    own = threading.get_ident()
+    names = {}
+    stacks = Counter()
+    categories = Counter()
+    ticks = 0
+    deadline = time.perf_counter() + seconds
+    next_tick = time.perf_counter()
+    while next_tick < deadline:
+        frames = sys._current_frames()
+        for ident, frame in frames.items():
+            if ident == own:
+                continue
+            stack = _stack(frame)
+            category = categorize(stack)
+            if category == "idle" and not include_idle:
+                continue
+            if ident not in names:
+                thread = next((t for t in threading.enumerate() if t.ident == ident), None)
+                names[ident] = thread.name if thread else str(ident)
+            key = ";".join([names[ident]] + [f"{m}.{f}" for m, f in stack])
+            stacks[key] += 1
+            categories[category] += 1
+        del frames
+        ticks += 1
+        next_tick += interval
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+    return stacks, categories, ticks
+
+
+def collapsed(stacks):
+    """Brendan Gregg's folded format, ready for flamegraph.pl or speedscope."""
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+
+
+def summary(stacks, categories, ticks, seconds, hz):
+    total = sum(categories.values())
+    return {
+        "seconds": seconds,
+        "hz": hz,
+        "ticks": ticks,
+        "samples": total,
+        "categories": {
+            c: {"samples": n, "share": n / total if total else 0.0}
+            for c, n in categories.most_common()
+        },
+        "top_stacks": [{"stack": s, "samples": n} for s, n in stacks.most_common(20)],
+    }
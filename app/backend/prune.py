@@ -0,0 +1,179 @@
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+import mindspore as ms
+import mindspore.nn as nn
+from mindspore import Tensor
+from mindspore.train.serialization import load_checkpoint, load_param_into_net, save_checkpoint
+
+import mobilenet_ms as mn
+from embedding_index import list_images
+from preprocess import preprocess_array
+
+rock_classes = [
+    "Basalt", "Chert", "Coal", "Gneiss", "Granite",
+    "Limestone", "Marble", "Obsidian", "Pumice",
+    "Sandstone", "Slate", "Travertine"
+]
+
+
+def load_net(ckpt_path):
+    net = mn.mobilenet_v2_for_checkpoint(len(rock_classes), ckpt_path)
+    load_param_into_net(net, load_checkpoint(ckpt_path))
+    net.set_train(False)
+    return net
+
+
+def _bn_arrays(bn):
+    return [bn.gamma, bn.beta, bn.moving_mean, bn.moving_variance]
+
+
+def _keep_indices(gamma, ratio, round_nearest=8):
+    """Indices of the channels with the largest |gamma|, in their original order."""
+    channels = len(gamma)
+    keep = min(channels, mn._make_divisible(channels * (1 - ratio), round_nearest))
+    return np.sort(np.argsort(-np.abs(gamma))[:keep])
+
+
+# --- Pruning ---
+def prune(net, ratio, prune_last=True, base_config=None):
+    """Rank channels by BatchNorm gamma and drop the weakest `ratio` of them.
+
+    Only channels that no other layer depends on are removed: the expanded
+    (hidden) width inside every inverted residual block and the final 1x1
+    conv feeding the head. Block outputs stay intact so residual additions
+    keep matching shapes.
+
+    Returns (arch config, {parameter name: pruned numpy array}).
+    """
+    arrays = {p.name: p.asnumpy() for p in net.get_parameters()}
+    features = net.backbone.features
+    hidden_dims = []
+
+    for i in range(1, len(features) - 1):
+        block = features[i]
+        layers = block.conv
+        if len(layers) != 4:
+            # expand_ratio == 1: the depthwise conv runs on the block input, nothing private to prune
+            hidden_dims.append(None)
+            continue
+        expand, dw, project = layers[0].features, layers[1].features, layers[2]
+        idx = _keep_indices(expand[1].gamma.asnumpy(), ratio)
+        hidden_dims.append(int(len(idx)))
+
+        arrays[expand[0].weight.name] = arrays[expand[0].weight.name][idx]
+        arrays[dw[0].weight.name] = arrays[dw[0].weight.name][idx]
+        for p in _bn_arrays(expand[1]) + _bn_arrays(dw[1]):
+            arrays[p.name] = arrays[p.name][idx]
+        arrays[project.weight.name] = arrays[project.weight.name][:, idx]
+
+    last = features[len(features) - 1].features
+    last_channel = int(last[0].weight.shape[0])
+    if prune_last:
+        idx = _keep_indices(last[1].gamma.asnumpy(), ratio)
+        last_channel = int(len(idx))
+        arrays[last[0].weight.name] = arrays[last[0].weight.name][idx]
+        for p in _bn_arrays(last[1]):
+            arrays[p.name] = arrays[p.name][idx]
+        dense = net.head.dense
+        arrays[dense.weight.name] = arrays[dense.weight.name][:, idx]
+
+    config = dict(base_config or {})
+    config["hidden_dims"] = hidden_dims
+    config["last_channel"] = last_channel
+    return config, arrays
+
+
+def build_pruned(config, arrays):
+    net = mn.mobilenet_v2(len(rock_classes), **config)
+    for p in net.get_parameters():
+        p.set_data(Tensor(arrays[p.name]))
+    net.set_train(False)
+    return net
+
+
+# --- Reporting ---
+def count_flops_params(net, input_size=224):
+    """Multiply-accumulates of every conv/dense layer for one image, plus trainable parameters."""
+    macs = 0
+    size = input_size
+    for _, cell in net.cells_and_names():
+        if isinstance(cell, nn.Conv2d):
+            stride = cell.stride[0] if isinstance(cell.stride, tuple) else cell.stride
+            size = math.ceil(size / stride)
+            kh, kw = cell.kernel_size
+            macs += cell.out_channels * (cell.in_channels // cell.group) * kh * kw * size * size
+        elif isinstance(cell, nn.Dense):
+            macs += cell.in_channels * cell.out_channels
+    params = sum(int(np.prod(p.shape)) for p in net.trainable_params())
+    return macs, params
+
+
+def measure_latency(net, batch_size=1, warmup=5, runs=30):
+    x = Tensor(np.random.rand(batch_size, 3, 224, 224).astype(np.float32))
+    for _ in range(warmup):
+        net(x).asnumpy()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        net(x).asnumpy()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000)
+
+
+def load_val(data_path):
+    items = [(p, rock_classes.index(l)) for p, l in list_images(data_path) if l in rock_classes]
+    x = []
+    for path, _ in items:
+        with open(path, "rb") as f:
+            x.append(preprocess_array(f.read()))
+    return np.concatenate(x), np.array([l for _, l in items])
+
+
+def evaluate(net, x, y, batch_size=32):
+    correct = 0
+    for start in range(0, len(x), batch_size):
+        logits = net(Tensor(x[start:start + batch_size], ms.float32)).asnumpy()
+        correct += int((np.argmax(logits, axis=1) == y[start:start + batch_size]).sum())
+    return correct / len(y)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune MobileNetV2 channels ranked by BatchNorm gamma.")
+    parser.add_argument("--ckpt", default="ckpt/mobilenet_v2-25_74.ckpt")
+    parser.add_argument("--ratios", type=float, nargs="+", default=[0.25, 0.5, 0.75])
+    parser.add_argument("--val", default="../../dataset/rocks_val")
+    parser.add_argument("--keep-last", action="store_true", help="do not prune the final 1x1 conv")
+    args = parser.parse_args()
+
+    base = load_net(args.ckpt)
+    base_config = mn.load_arch_config(args.ckpt)
+    x, y = load_val(args.val) if os.path.isdir(args.val) else (None, None)
+
+    rows = []
+    def report(name, net):
+        macs, params = count_flops_params(net)
+        acc = evaluate(net, x, y) if x is not None else float("nan")
+        rows.append((name, macs / 1e6, params / 1e6, measure_latency(net), acc))
+
+    report("original", base)
+    stem = os.path.splitext(args.ckpt)[0]
+    for ratio in args.ratios:
+        config, arrays = prune(base, ratio, prune_last=not args.keep_last, base_config=base_config)
+        net = build_pruned(config, arrays)
+        out = f"{stem}-pruned{int(round(ratio * 100))}.ckpt"
+        save_checkpoint(net, out)
+        mn.save_arch_config(out, config)
+        print(f"Saved {out} (+ {os.path.basename(mn.arch_config_path(out))})")
+        report(f"pruned {ratio:.0%}", net)
+
+    print(f"\n{'model':<14}{'MMACs':>10}{'params (M)':>12}{'latency ms':>12}{'val acc':>10}")
+    for name, macs, params, latency, acc in rows:
+        print(f"{name:<14}{macs:>10.1f}{params:>12.2f}{latency:>12.2f}{acc:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
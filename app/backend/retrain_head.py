@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import mindspore as ms
+import mindspore.nn as nn
+from mindspore import Tensor
+from mindspore.train.serialization import load_checkpoint, load_param_into_net, save_checkpoint
+
+import mobilenet_ms as mn
+from heads import backbone_fingerprint
+from embedding_index import list_images
+from preprocess import preprocess_array
+
+rock_classes = [
+    "Basalt", "Chert", "Coal", "Gneiss", "Granite",
+    "Limestone", "Marble", "Obsidian", "Pumice",
+    "Sandstone", "Slate", "Travertine"
+]
+class_indexing = {name: idx for idx, name in enumerate(rock_classes)}
+
+
+def _fingerprint(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def build_net(ckpt_path):
+    net = mn.mobilenet_v2_for_checkpoint(len(rock_classes), ckpt_path)
+    load_param_into_net(net, load_checkpoint(ckpt_path))
+    net.set_train(False)
+    return net
+
+
+# --- Feature cache ---
+class FeatureCache:
+    """Pooled backbone features for every image of a folder, keyed by path.
+
+    Entries are valid while the image's (size, mtime) and the backbone
+    weights are unchanged, so later runs only featurize new images.
+    """
+
+    def __init__(self, cache_dir, backbone_key):
+        self.cache_dir = cache_dir
+        self.backbone_key = backbone_key
+        self.entries = {}
+        self.features = np.zeros((0, 0), dtype=np.float32)
+        manifest_path = os.path.join(cache_dir, "manifest.json")
+        if os.path.isfile(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest["backbone_key"] == backbone_key:
+                self.entries = manifest["entries"]
+                self.features = np.load(os.path.join(cache_dir, "features.npy"))
+
+    def update(self, items, net, batch_size=32):
+        """Featurize missing or changed images; drop entries that disappeared."""
+        rows, vectors = [], []
+        stale = []
+        for path, _ in items:
+            e = self.entries.get(path)
+            if e is None or e["fingerprint"] != _fingerprint(path):
+                stale.append(path)
+
+        for start in range(0, len(stale), batch_size):
+            batch = stale[start:start + batch_size]
+            arrays = []
+            for path in batch:
+                with open(path, "rb") as f:
+                    arrays.append(preprocess_array(f.read()))
+            feats = net.head.head(net.backbone(Tensor(np.concatenate(arrays), ms.float32))).asnumpy()
+            for path, feat in zip(batch, feats):
+                rows.append(path)
+                vectors.append(feat)
+            print(f"Featurized {start + len(batch)}/{len(stale)} images")
+
+        new_features = {p: v for p, v in zip(rows, vectors)}
+        kept_paths = [p for p, _ in items]
+        dim = self.features.shape[1] if self.features.size else (len(vectors[0]) if vectors else 0)
+        out = np.zeros((len(kept_paths), dim), dtype=np.float32)
+        entries = {}
+        for i, path in enumerate(kept_paths):
+            if path in new_features:
+                out[i] = new_features[path]
+            else:
+                out[i] = self.features[self.entries[path]["row"]]
+            entries[path] = {"row": i, "fingerprint": _fingerprint(path)}
+        self.features = out
+        self.entries = entries
+        return len(stale)
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        np.save(os.path.join(self.cache_dir, "features.npy"), self.features)
+        with open(os.path.join(self.cache_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"backbone_key": self.backbone_key, "entries": self.entries}, f)
+
+    def arrays(self, items):
+        x = np.stack([self.features[self.entries[p]["row"]] for p, _ in items])
+        y = np.array([class_indexing[l] for _, l in items], dtype=np.int32)
+        return x, y
+
+
+def labelled_items(data_path):
+    return [(p, l) for p, l in list_images(data_path) if l in class_indexing]
+
+
+# --- Head training ---
+def train_head(dense, x, y, epochs=100, batch_size=64, lr=0.01, balance=False, seed=0):
+    """Train only the classifier Dense layer on pooled features."""
+    loss_fn = nn.SoftmaxCrossEntropyWithLogits(sparse=True, reduction="mean")
+    optimizer = nn.Momentum(dense.trainable_params(), learning_rate=lr, momentum=0.9, weight_decay=1e-4)
+    step = nn.TrainOneStepCell(nn.WithLossCell(dense, loss_fn), optimizer)
+    step.set_train(True)
+
+    rng = np.random.default_rng(seed)
+    if balance:
+        # oversample rare classes so every class is drawn equally often
+        counts = np.bincount(y, minlength=len(rock_classes)).astype(np.float64)
+        weights = 1.0 / counts[y]
+        weights /= weights.sum()
+
+    steps_per_epoch = max(1, len(x) // batch_size)
+    for epoch in range(epochs):
+        if balance:
+            order = rng.choice(len(x), size=steps_per_epoch * batch_size, p=weights)
+        else:
+            order = rng.permutation(len(x))
+        losses = []
+        for s in range(steps_per_epoch):
+            idx = order[s * batch_size:(s + 1) * batch_size]
+            if len(idx) == 0:
+                continue
+            loss = step(Tensor(x[idx], ms.float32), Tensor(y[idx], ms.int32))
+            losses.append(float(loss.asnumpy()))
+        if (epoch + 1) % 10 == 0 or epoch == 0:
+            print(f"epoch {epoch + 1}/{epochs}  loss {np.mean(losses):.4f}")
+    step.set_train(False)
+
+
+def accuracy(dense, x, y):
+    dense.set_train(False)
+    pred = np.argmax(dense(Tensor(x, ms.float32)).asnumpy(), axis=1)
+    return float((pred == y).mean())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrain only the MobileNetV2 head on cached backbone features.")
+    parser.add_argument("--ckpt", default="ckpt/mobilenet_v2-25_74.ckpt", help="checkpoint providing the frozen backbone")
+    parser.add_argument("--train", default="../../dataset/rocks_train")
+    parser.add_argument("--val", default="../../dataset/rocks_val")
+    parser.add_argument("--cache", default="features", help="feature cache directory")
+    parser.add_argument("--out", default="ckpt/mobilenet_v2-head.ckpt")
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--lr", type=float, default=0.01)
+    parser.add_argument("--balance", action="store_true", help="sample classes uniformly")
+    parser.add_argument("--reinit", action="store_true", help="start from a fresh head instead of the checkpoint's")
+    args = parser.parse_args()
+
+    net = build_net(args.ckpt)
+    # keyed on the backbone weights only: a head-retrained checkpoint reuses the cache
+    names = sorted(p.name for p in net.backbone.get_parameters())
+    backbone_key = backbone_fingerprint({p.name: p.asnumpy() for p in net.backbone.get_parameters()},
+                                        names, mn.load_arch_config(args.ckpt))
+
+    start = time.perf_counter()
+    splits = {}
+    for name, path in (("train", args.train), ("val", args.val)):
+        if not path or not os.path.isdir(path):
+            continue
+        items = labelled_items(path)
+        cache = FeatureCache(os.path.join(args.cache, name), backbone_key)
+        cache.update(items, net)
+        cache.save()
+        splits[name] = cache.arrays(items)
+    print(f"Features ready in {time.perf_counter() - start:.2f}s")
+
+    dense = net.head.dense
+    if args.reinit:
+        net.head._initialize_weights()
+
+    x, y = splits["train"]
+    start = time.perf_counter()
+    train_head(dense, x, y, epochs=args.epochs, lr=args.lr, balance=args.balance)
+    print(f"Head trained in {time.perf_counter() - start:.2f}s")
+
+    print(f"train accuracy: {accuracy(dense, x, y):.4f}")
+    if "val" in splits:
+        print(f"val accuracy:   {accuracy(dense, *splits['val']):.4f}")
+
+    # The full network is saved so load_model() can serve it unchanged
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    save_checkpoint(net, args.out)
+    arch_config = mn.load_arch_config(args.ckpt)
+    if arch_config:
+        mn.save_arch_config(args.out, arch_config)
+    print(f"Saved checkpoint to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import websockets
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, Form, Depends
+from fastapi.responses import Response
+
+from admin import require_admin
+
+app = FastAPI()
+
+# --- Backend pool ---
+HEALTH_INTERVAL = 2.0
+UNHEALTHY_AFTER = 2  # consecutive failed health checks
+REQUEST_TIMEOUT = 30.0
+# hop-by-hop headers must not be forwarded by a proxy
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "upgrade", "host", "content-length"}
+
+
+class Backend:
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.ws_url = "ws" + self.url[len("http"):]
+        self.outstanding = 0
+        self.websockets = 0
+        self.healthy = False
+        self.draining = False
+        self.shedding = False
+        self.failures = 0
+        self.served = 0
+        self.errors = 0
+        self.ckpt = None
+        self.last_check = None
+
+    @property
+    def load(self):
+        return self.outstanding + self.websockets
+
+    def as_dict(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "draining": self.draining,
+            "shedding": self.shedding,
+            "outstanding": self.outstanding,
+            "websockets": self.websockets,
+            "served": self.served,
+            "errors": self.errors,
+            "ckpt": self.ckpt,
+        }
+
+
+backends = []
+processes = {}
+client = None
+_tiebreak = itertools.count()
+
+
+def pick_backend(exclude=()):
+    """Healthy, non-draining backend with the fewest outstanding requests (ties rotate)."""
+    candidates = [b for b in backends if b.healthy and not b.draining and not b.shedding and b not in exclude]
+    if not candidates:
+        return None
+    low = min(b.load for b in candidates)
+    tied = [b for b in candidates if b.load == low]
+    return tied[next(_tiebreak) % len(tied)]
+
+
+async def check_health(backend):
+    try:
+        r = await client.get(f"{backend.url}/health", timeout=2.0)
+        r.raise_for_status()
+        data = r.json()
+        backend.ckpt = data.get("ckpt")
+        # a backend over its memory limit refuses predictions, so route around it
+        backend.shedding = data.get("shedding", False)
+        backend.failures = 0
+        backend.healthy = True
+    except Exception:
+        backend.failures += 1
+        if backend.failures >= UNHEALTHY_AFTER:
+            backend.healthy = False
+    backend.last_check = time.time()
+
+
+async def health_loop():
+    while True:
+        await asyncio.gather(*(check_health(b) for b in backends))
+        restart_exited()
+        await asyncio.sleep(HEALTH_INTERVAL)
+
+
+@app.on_event("startup")
+async def startup():
+    global client
+    client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT,
+                               limits=httpx.Limits(max_keepalive_connections=64, max_connections=256))
+    await asyncio.gather(*(check_health(b) for b in backends))
+    asyncio.create_task(health_loop())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await client.aclose()
+    for p in processes.values():
+        p.terminate()
+
+
+# --- Drain / rolling model change ---
+async def wait_idle(backend, timeout):
+    deadline = time.monotonic() + timeout
+    while backend.load > 0 and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    return backend.load == 0
+
+
+async def wait_healthy(backend, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        await check_health(backend)
+        if backend.healthy:
+            return True
+        await asyncio.sleep(0.5)
+    return False
+
+
+def find_backend(url):
+    return next((b for b in backends if b.url == url.rstrip("/")), None)
+
+
+@app.get("/router/stats")
+async def router_stats():
+    return {"backends": [b.as_dict() for b in backends]}
+
+
+@app.post("/router/drain", dependencies=[Depends(require_admin)])
+async def drain(url: str = Form(...), timeout: float = Form(30.0)):
+    backend = find_backend(url)
+    if backend is None:
+        return {"status": "error", "message": f"Unknown backend {url}"}
+    backend.draining = True
+    idle = await wait_idle(backend, timeout)
+    return {"status": "success" if idle else "error",
+            "message": "Backend drained." if idle else "Timed out with requests still in flight.",
+            "backend": backend.as_dict()}
+
+
+@app.post("/router/undrain", dependencies=[Depends(require_admin)])
+async def undrain(url: str = Form(...)):
+    backend = find_backend(url)
+    if backend is None:
+        return {"status": "error", "message": f"Unknown backend {url}"}
+    backend.draining = False
+    return {"status": "success", "backend": backend.as_dict()}
+
+
+@app.post("/change_model")
+async def change_model(ckpt_path: str = Form(...), drain_timeout: float = Form(30.0)):
+    """Roll the checkpoint out one backend at a time so the others keep serving."""
+    results = []
+    for backend in list(backends):
+        if not backend.healthy:
+            results.append({"url": backend.url, "status": "skipped", "message": "Unhealthy."})
+            continue
+        backend.draining = True
+        try:
+            await wait_idle(backend, drain_timeout)
+            r = await client.post(f"{backend.url}/change_model", data={"ckpt_path": ckpt_path}, timeout=120.0)
+            result = r.json()
+            results.append({"url": backend.url, **result})
+            if result.get("status") != "success":
+                # stop the rollout, leaving the remaining backends on the old model
+                break
+            await wait_healthy(backend, 60.0)
+        finally:
+            backend.draining = False
+
+    ok = len(results) == len(backends) and all(r["status"] in ("success", "skipped") for r in results)
+    return {
+        "status": "success" if ok else "error",
+        "message": f"Model changed to {ckpt_path}" if ok else "Rollout incomplete.",
+        "backends": results
+    }
+
+
+# --- HTTP proxy ---
+def client_id(connection):
+    # Backends see every request coming from the router, so name the original caller for fair share
+    return connection.headers.get("x-client-id") or f"{connection.client.host}:{connection.client.port}"
+
+
+async def forward(request: Request, path: str):
+    body = await request.body()
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+    headers["x-client-id"] = client_id(request)
+    tried = []
+    while True:
+        backend = pick_backend(exclude=tried)
+        if backend is None:
+            return Response('{"status": "error", "message": "No healthy backend available."}',
+                            status_code=503, media_type="application/json")
+        backend.outstanding += 1
+        try:
+            r = await client.request(request.method, f"{backend.url}/{path}", params=request.query_params,
+                                     content=body, headers=headers)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+            # the request never left the router, so it is safe to retry elsewhere
+            backend.errors += 1
+            backend.failures += 1
+            if backend.failures >= UNHEALTHY_AFTER:
+                backend.healthy = False
+            tried.append(backend)
+            continue
+        except httpx.TimeoutException:
+            # the backend may still be working on it: don't send it twice, the health loop judges liveness
+            backend.errors += 1
+            return Response('{"status": "error", "message": "Backend timed out."}',
+                            status_code=504, media_type="application/json")
+        except httpx.TransportError:
+            backend.errors += 1
+            return Response('{"status": "error", "message": "Backend connection failed mid-request."}',
+                            status_code=502, media_type="application/json")
+        finally:
+            backend.outstanding -= 1
+        backend.served += 1
+        out_headers = {k: v for k, v in r.headers.items() if k.lower() not in HOP_HEADERS}
+        return Response(r.content, status_code=r.status_code, headers=out_headers)
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def proxy(request: Request, path: str):
+    if path == "admin" or path.startswith("admin/"):
+        # backends trust 127.0.0.1, which is every proxied request, so check the real caller here
+        require_admin(request)
+    return await forward(request, path)
+
+
+# --- WebSocket proxy ---
+@app.websocket("/{path:path}")
+async def websocket_proxy(websocket: WebSocket, path: str):
+    # A WebSocket stays on the backend it was first routed to
+    backend = pick_backend()
+    if backend is None:
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    backend.websockets += 1
+    query = f"?{websocket.url.query}" if websocket.url.query else ""
+    try:
+        async with websockets.connect(f"{backend.ws_url}/{path}{query}", max_size=None,
+                                      additional_headers={"X-Client-Id": client_id(websocket)}) as upstream:
+            async def client_to_backend():
+                try:
+                    while True:
+                        await upstream.send(await websocket.receive_text())
+                except WebSocketDisconnect:
+                    await upstream.close()
+
+            async def backend_to_client():
+                async for message in upstream:
+                    await websocket.send_text(message)
+                    backend.served += 1
+
+            tasks = [asyncio.create_task(client_to_backend()), asyncio.create_task(backend_to_client())]
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for t in pending:
+                t.cancel()
+    except (OSError, websockets.WebSocketException):
+        backend.errors += 1
+    finally:
+        backend.websockets -= 1
+        try:
+            await websocket.close()
+        except RuntimeError:
+            pass
+
+
+# --- Local launcher ---
+def start_backend(port, ckpt=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, ROCK_MODEL=ckpt) if ckpt else None
+    processes[port] = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=here, env=env)
+
+
+def spawn_backends(count, base_port):
+    """Start `count` uvicorn backend processes on consecutive local ports."""
+    urls = []
+    for i in range(count):
+        port = base_port + i
+        start_backend(port)
+        urls.append(f"http://127.0.0.1:{port}")
+    return urls
+
+
+def restart_exited():
+    # e.g. a backend whose memory watchdog recycled it; keep the checkpoint it was serving
+    for port, process in list(processes.items()):
+        if process.poll() is None:
+            continue
+        backend = find_backend(f"http://127.0.0.1:{port}")
+        print(f"Backend on port {port} exited ({process.returncode}), restarting")
+        start_backend(port, backend.ckpt if backend else None)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Least-outstanding-requests router for local backend instances.")
+    parser.add_argument("--backends", nargs="*", default=[], help="existing backend URLs, e.g. http://127.0.0.1:8001")
+    parser.add_argument("--spawn", type=int, default=0, help="launch this many local backends")
+    parser.add_argument("--spawn-port", type=int, default=8001)
+    parser.add_argument("--host", default="127.0.0.1", help="0.0.0.0 to accept other machines (set ROCK_ADMIN_TOKEN)")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    urls = list(args.backends) + spawn_backends(args.spawn, args.spawn_port)
+    if not urls:
+        parser.error("give --backends and/or --spawn")
+    backends.extend(Backend(u) for u in urls)
+    try:
+        uvicorn.run(app, host=args.host, port=args.port)
+    finally:
+        for p in processes.values():
+            p.terminate()
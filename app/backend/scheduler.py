@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Highest priority first
+PRIORITIES = ("interactive", "normal", "bulk")
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class _Job:
+    __slots__ = ("fn", "args", "deadline", "enqueued", "future", "loop", "on_drop")
+
+    def __init__(self, fn, args, deadline, future, loop, on_drop=None):
+        self.fn = fn
+        self.args = args
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.future = future
+        self.loop = loop
+        self.on_drop = on_drop
+
+
+class _ClassStats:
+
+    def __init__(self):
+        self.submitted = 0
+        self.served = 0
+        self.dropped = 0
+        self.queue_times = deque(maxlen=1000)
+
+    def as_dict(self, queued):
+        times = sorted(self.queue_times)
+        def pct(p):
+            return times[min(len(times) - 1, int(p * len(times)))] * 1000 if times else None
+        return {
+            "queued": queued,
+            "submitted": self.submitted,
+            "served": self.served,
+            "dropped": self.dropped,
+            "queue_ms_avg": sum(times) / len(times) * 1000 if times else None,
+            "queue_ms_p50": pct(0.50),
+            "queue_ms_p95": pct(0.95),
+        }
+
+
+class InferenceScheduler:
+    """Strict-priority scheduler with round-robin fairness between clients.
+
+    Each priority class keeps one FIFO per client; the worker always serves the
+    highest non-empty class and rotates through its clients, so one connection
+    submitting a bulk job cannot starve another in the same class. Jobs whose
+    deadline has passed are dropped when dequeued, before any work is done.
+    """
+
+    def __init__(self, workers=1, priorities=PRIORITIES):
+        self.priorities = tuple(priorities)
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._queues = {p: OrderedDict() for p in self.priorities}
+        self._stats = {p: _ClassStats() for p in self.priorities}
+        self._threads = []
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"inference-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def check_priority(self, priority):
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {', '.join(self.priorities)}")
+
+    async def submit(self, fn, *args, priority="normal", client=None, deadline_ms=None, on_drop=None):
+        """Run fn(*args) on a worker thread once scheduled and return its result.
+
+        on_drop, if given, is called instead of fn when the job is dropped
+        (deadline passed or caller cancelled), e.g. to free resources fn would have.
+        It is not called when submit() itself raises, so check_priority() first.
+        """
+        self.check_priority(priority)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        deadline = time.monotonic() + deadline_ms / 1000 if deadline_ms is not None else None
+        job = _Job(fn, args, deadline, future, loop, on_drop)
+        with self._cond:
+            self._ensure_started()
+            self._queues[priority].setdefault(client, deque()).append(job)
+            self._stats[priority].submitted += 1
+            self._cond.notify()
+        return await future
+
+    def _next_job(self):
+        for p in self.priorities:
+            clients = self._queues[p]
+            if not clients:
+                continue
+            client, jobs = next(iter(clients.items()))
+            job = jobs.popleft()
+            if jobs:
+                clients.move_to_end(client)
+            else:
+                del clients[client]
+            return p, job
+        return None, None
+
+    @staticmethod
+    def _resolve(job, result=None, error=None):
+        def apply():
+            if job.future.done():
+                return
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+        job.loop.call_soon_threadsafe(apply)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                priority, job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    priority, job = self._next_job()
+                stats = self._stats[priority]
+                now = time.monotonic()
+                expired = job.deadline is not None and now > job.deadline
+                if job.future.cancelled() or expired:
+                    stats.dropped += 1
+                    if job.on_drop is not None:
+                        job.on_drop()
+                    if expired:
+                        self._resolve(job, error=DeadlineExceeded("Deadline exceeded before inference started"))
+                    continue
+                stats.queue_times.append(now - job.enqueued)
+            try:
+                result = job.fn(*job.args)
+            except Exception as e:
+                self._resolve(job, error=e)
+            else:
+                self._resolve(job, result=result)
+            with self._cond:
+                stats.served += 1
+
+    def pending(self):
+        """Number of jobs waiting for a worker, across all classes."""
+        with self._cond:
+            return sum(len(q) for clients in self._queues.values() for q in clients.values())
+
+    def stats(self):
+        with self._cond:
+            return {
+                p: self._stats[p].as_dict(sum(len(q) for q in self._queues[p].values()))
+                for p in self.priorities
+            }
@@ -0,0 +1,177 @@
+import multiprocessing as mp
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+import mindspore as ms
+from mindspore import Tensor, ops
+from mindspore.train.serialization import load_checkpoint, load_param_into_net
+
+import mobilenet_ms as mn
+
+BINS = 10
+
+
+def _percentile(values, p):
+    return float(np.percentile(values, p)) if values else None
+
+
+def _shadow_worker(ckpt_path, num_classes, threads, conn):
+    """Candidate network in its own process, so its intra-op threads can be capped."""
+    import autotune as at
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+    at.apply_threads(threads)
+    try:
+        net = mn.mobilenet_v2_for_checkpoint(num_classes, ckpt_path)
+        load_param_into_net(net, load_checkpoint(ckpt_path))
+        net.set_train(False)
+    except Exception as e:
+        conn.send(str(e))
+        return
+    conn.send(None)
+    softmax = ops.Softmax()
+    while True:
+        x = conn.recv()
+        if x is None:
+            break
+        start = time.perf_counter()
+        probs = softmax(net(Tensor(x, ms.float32))).asnumpy()[0]
+        conn.send((probs, (time.perf_counter() - start) * 1000))
+
+
+class ShadowEvaluator:
+    """Mirror a sample of live requests to a candidate checkpoint.
+
+    offer() is called on the serving path and never blocks: sampled inputs
+    go into a small bounded queue that a single thread drains. When the
+    queue is full, or busy_fn reports queued user traffic (checked again
+    right before each shadow forward), the sample is dropped instead.
+    The candidate runs in a niced child process limited to `threads`
+    intra-op threads, so it cannot take every core from the serving model.
+    """
+
+    def __init__(self, ckpt_path, num_classes, class_names, fraction=0.1, max_queue=4, busy_fn=None, threads=1):
+        self.ckpt_path = ckpt_path
+        self.class_names = class_names
+        self.fraction = fraction
+        self.busy_fn = busy_fn
+        self.threads = threads
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(target=_shadow_worker, name="shadow", daemon=True,
+                                    args=(ckpt_path, num_classes, threads, child_conn))
+        self._process.start()
+        error = self._conn.recv()
+        if error is not None:
+            self._process.join()
+            raise RuntimeError(error)
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.mirrored = 0
+        self.completed = 0
+        self.dropped = 0
+        self.agreements = 0
+        self.disagreements = Counter()
+        self.serving_conf = np.zeros(BINS, dtype=np.int64)
+        self.shadow_conf = np.zeros(BINS, dtype=np.int64)
+        self.serving_ms = deque(maxlen=2000)
+        self.shadow_ms = deque(maxlen=2000)
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="shadow", daemon=True)
+        self._thread.start()
+
+    def offer(self, input_array, serving_probs, serving_ms):
+        if random.random() >= self.fraction:
+            return
+        with self._lock:
+            self.mirrored += 1
+        if self.busy_fn is not None and self.busy_fn():
+            with self._lock:
+                self.dropped += 1
+            return
+        try:
+            # copy only once the sample is accepted; input may live in a reusable buffer
+            self._queue.put_nowait((np.array(input_array, dtype=np.float32), serving_probs, serving_ms))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _run(self):
+        while not self._stop:
+            try:
+                x, serving_probs, serving_ms = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if self.busy_fn is not None and self.busy_fn():
+                # user traffic arrived while this sample waited
+                with self._lock:
+                    self.dropped += 1
+                continue
+            try:
+                self._conn.send(x)
+                probs, shadow_ms = self._conn.recv()
+            except (EOFError, OSError):
+                # the shadow process died; serving is unaffected
+                self._stop = True
+                break
+            self._record(serving_probs, probs, serving_ms, shadow_ms)
+        else:
+            self._conn.send(None)
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+
+    def _record(self, serving_probs, shadow_probs, serving_ms, shadow_ms):
+        s_cls, c_cls = int(np.argmax(serving_probs)), int(np.argmax(shadow_probs))
+        s_conf, c_conf = float(serving_probs[s_cls]), float(shadow_probs[c_cls])
+        with self._lock:
+            self.completed += 1
+            if s_cls == c_cls:
+                self.agreements += 1
+            else:
+                self.disagreements[(s_cls, c_cls)] += 1
+            self.serving_conf[min(BINS - 1, int(s_conf * BINS))] += 1
+            self.shadow_conf[min(BINS - 1, int(c_conf * BINS))] += 1
+            self.serving_ms.append(serving_ms)
+            self.shadow_ms.append(shadow_ms)
+
+    def stop(self):
+        self._stop = True
+
+    def stats(self):
+        with self._lock:
+            serving_ms, shadow_ms = list(self.serving_ms), list(self.shadow_ms)
+            return {
+                "candidate": self.ckpt_path,
+                "fraction": self.fraction,
+                "threads": self.threads,
+                "uptime_s": time.time() - self.started,
+                "mirrored": self.mirrored,
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "agreement_rate": self.agreements / self.completed if self.completed else None,
+                "top_disagreements": [
+                    {"serving": self.class_names[s], "candidate": self.class_names[c], "count": n}
+                    for (s, c), n in self.disagreements.most_common(10)
+                ],
+                "confidence_histogram": {
+                    "bins": [round(i / BINS, 2) for i in range(BINS + 1)],
+                    "serving": self.serving_conf.tolist(),
+                    "candidate": self.shadow_conf.tolist(),
+                },
+                "latency_ms": {
+                    "serving_p50": _percentile(serving_ms, 50),
+                    "serving_p95": _percentile(serving_ms, 95),
+                    "candidate_p50": _percentile(shadow_ms, 50),
+                    "candidate_p95": _percentile(shadow_ms, 95),
+                },
+            }
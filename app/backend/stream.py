@@ -0,0 +1,155 @@
+import asyncio
+import base64
+import io
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+
+class LatestFrameStream:
+    """Per-connection state for continuous classification.
+
+    Incoming frames overwrite a single slot, so whatever arrives while a
+    forward pass is running replaces the previous pending frame instead of
+    queueing behind it. The worker classifies at most `max_fps` frames per
+    second and smooths probabilities over the last `window` results.
+    classify_fn is a coroutine function taking the frame bytes.
+    """
+
+    def __init__(self, classify_fn, max_fps=10.0, window=5):
+        self.classify_fn = classify_fn
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.history = deque(maxlen=max(1, window))
+        self.pending = None
+        self.new_frame = asyncio.Event()
+        self.closed = False
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.frames_failed = 0
+        self.lag_ms = deque(maxlen=100)
+
+    def push(self, image_bytes, sent_at=None):
+        """Store the newest frame; any frame not yet classified is dropped."""
+        self.frames_received += 1
+        if self.pending is not None:
+            self.frames_dropped += 1
+        self.pending = (image_bytes, sent_at, time.time())
+        self.new_frame.set()
+
+    def close(self):
+        self.closed = True
+        self.new_frame.set()
+
+    def stats(self):
+        lag = list(self.lag_ms)
+        return {
+            "frames_received": self.frames_received,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.frames_dropped,
+            "frames_failed": self.frames_failed,
+            "lag_ms": lag[-1] if lag else None,
+            "lag_ms_avg": float(np.mean(lag)) if lag else None,
+        }
+
+    def smoothed(self, probabilities):
+        self.history.append(probabilities)
+        return np.mean(self.history, axis=0)
+
+    async def run(self, send_fn, error_fn=None):
+        """Classify the latest frame whenever one is available, rate limited.
+
+        A frame that fails (e.g. cannot be decoded) is reported through
+        error_fn and skipped; the stream keeps going with the next one.
+        """
+        last = 0.0
+        while True:
+            await self.new_frame.wait()
+            if self.closed:
+                return
+            wait = last + self.min_interval - time.monotonic()
+            if wait > 0:
+                # frames keep arriving (and replacing each other) during the sleep
+                await asyncio.sleep(wait)
+            self.new_frame.clear()
+            frame, self.pending = self.pending, None
+            if frame is None:
+                continue
+            image_bytes, sent_at, received_at = frame
+            last = time.monotonic()
+            try:
+                # awaited, not run inline, so receiving never stalls during the forward pass
+                probabilities = await self.classify_fn(image_bytes)
+            except Exception as e:
+                self.frames_failed += 1
+                if error_fn is not None:
+                    await error_fn(e, self.stats())
+                continue
+            self.frames_processed += 1
+            origin = sent_at if sent_at is not None else received_at
+            self.lag_ms.append((time.time() - origin) * 1000)
+            await send_fn(probabilities, self.smoothed(probabilities), self.stats())
+
+
+# --- Synthetic frame generator ---
+def synthetic_frames(count, size=(320, 240), seed=0):
+    """Yield JPEG-encoded noise frames with a drifting colour, like a moving conveyor."""
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        base = np.array([(i * 3) % 255, 120, 255 - (i * 3) % 255], dtype=np.float32)
+        noise = rng.normal(0, 40, (size[1], size[0], 3))
+        img = Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=80)
+        yield buf.getvalue()
+
+
+async def run_synthetic_client(url, fps=30.0, seconds=10.0):
+    """Send synthetic frames at `fps` and print the server's stream statistics."""
+    import websockets
+    interval = 1.0 / fps
+    total = int(fps * seconds)
+    last = {}
+
+    async with websockets.connect(url, max_size=None) as ws:
+        async def sender():
+            for frame in synthetic_frames(total):
+                await ws.send(json.dumps({
+                    "type": "frame",
+                    "data": base64.b64encode(frame).decode("utf-8"),
+                    "ts": time.time()
+                }))
+                await asyncio.sleep(interval)
+            await asyncio.sleep(1.0)
+            await ws.close()
+
+        async def receiver():
+            try:
+                async for message in ws:
+                    message = json.loads(message)
+                    if message.get("type") == "error":
+                        print(f"error: {message.get('message')}")
+                        continue
+                    last.update(message)
+                    stats = last.get("stats", {})
+                    print(f"{last.get('class'):<11} {last.get('confidence', 0):.2f}  "
+                          f"recv {stats.get('frames_received')}  proc {stats.get('frames_processed')}  "
+                          f"lag {stats.get('lag_ms', 0):.1f} ms")
+            except websockets.ConnectionClosed:
+                pass
+
+        await asyncio.gather(sender(), receiver())
+
+    stats = last.get("stats", {})
+    print(f"\nSent {total} frames at {fps} fps; server processed {stats.get('frames_processed')} "
+          f"and dropped {stats.get('frames_dropped')}, average lag {stats.get('lag_ms_avg') or 0:.1f} ms")
+
+
+if __name__ == "__main__":
+    import sys
+    url = sys.argv[1] if len(sys.argv) > 1 else "ws://localhost:8000/ws/stream?fps=10&window=5"
+    fps = float(sys.argv[2]) if len(sys.argv) > 2 else 30.0
+    asyncio.run(run_synthetic_client(url, fps=fps))
@@ -0,0 +1,146 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from preprocess import IMAGE_SIZE, MEAN, STD
+
+# Refuse anything larger before decoding a single pixel (decompression bombs).
+# Pillow itself refuses images over 2 * Image.MAX_IMAGE_PIXELS in Image.open;
+# that is reported as ImageTooLarge too, so the effective limit is the lower one.
+MAX_PIXELS = 200_000_000
+# Only JPEG can be decoded at reduced scale (draft()); every other format is
+# decoded at full resolution first, so it gets a lower cap to bound memory
+MAX_FULL_DECODE_PIXELS = 50_000_000
+# Longest side the image is decoded/reduced to before tiling
+MAX_SIDE = 2048
+# Most tiles one request may classify; bounds the work, memory is bounded by batch_size
+MAX_TILES = 1024
+# Modes Image.reduce() accepts; others (e.g. palette) are converted first
+REDUCIBLE_MODES = ("L", "LA", "RGB", "RGBA", "RGBX", "CMYK", "YCbCr", "I", "F")
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+class TooManyTiles(ValueError):
+    pass
+
+
+def decode_bounded(image_bytes, max_side=MAX_SIDE, max_pixels=MAX_PIXELS, max_full_decode=MAX_FULL_DECODE_PIXELS):
+    """Decode to RGB with the longest side at most max_side.
+
+    The header is checked against max_pixels first. JPEGs are decoded
+    directly at reduced scale via draft(), so the full-resolution bitmap is
+    never materialized. Other formats must be decoded in full, so they are
+    limited to max_full_decode pixels and shrunk with reduce() before the
+    RGB conversion makes another full-size copy.
+    """
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e)) from e
+    w, h = img.size
+    if w * h > max_pixels:
+        raise ImageTooLarge(f"Image has {w * h} pixels, the limit is {max_pixels}.")
+    scale = min(1.0, max_side / max(w, h))
+    if img.format == "JPEG":
+        if scale < 1.0:
+            img.draft("RGB", (int(w * scale), int(h * scale)))
+    elif w * h > max_full_decode:
+        raise ImageTooLarge(f"{img.format} image has {w * h} pixels; only JPEG images may exceed {max_full_decode}.")
+    factor = int(max(img.size) // max_side)
+    if factor >= 2 and img.mode in REDUCIBLE_MODES:
+        img = img.reduce(factor)
+    img = img.convert("RGB")
+    if max(img.size) > max_side:
+        scale = max_side / max(img.size)
+        img = img.resize((max(1, round(img.size[0] * scale)), max(1, round(img.size[1] * scale))), Image.BILINEAR)
+    return img
+
+
+def tile_positions(length, tile, stride):
+    """Start offsets covering [0, length) with the last tile flush to the edge."""
+    if length <= tile:
+        return [0]
+    positions = list(range(0, length - tile + 1, stride))
+    if positions[-1] != length - tile:
+        positions.append(length - tile)
+    return positions
+
+
+def make_tiles(img, tile=IMAGE_SIZE, overlap=0.25, max_side=MAX_SIDE, max_tiles=MAX_TILES):
+    """Lay out overlapping tile x tile crops without cutting them yet.
+
+    Images narrower than a tile are upscaled, but never past max_side, and
+    then padded with the mean colour, so a thin strip can't be stretched
+    into a huge bitmap. The grid is checked against max_tiles before any
+    crop is made. Returns the pixels, the (y, x) tile origins and the grid.
+    """
+    w, h = img.size
+    if min(w, h) < tile:
+        # small images are upscaled so at least one full tile fits
+        scale = min(tile / min(w, h), max(max_side, tile) / max(w, h))
+        img = img.resize((max(1, round(w * scale)), max(1, round(h * scale))), Image.BILINEAR)
+        w, h = img.size
+    pixels = np.asarray(img)
+    if min(w, h) < tile:
+        # mean colour normalizes to zero, the most neutral input for the padding
+        padded = np.empty((max(h, tile), max(w, tile), 3), dtype=np.uint8)
+        padded[:] = np.round(MEAN * 255).astype(np.uint8)
+        padded[:h, :w] = pixels
+        pixels = padded
+        h, w = pixels.shape[:2]
+    stride = max(1, int(tile * (1 - overlap)))
+    xs, ys = tile_positions(w, tile, stride), tile_positions(h, tile, stride)
+    if len(xs) * len(ys) > max_tiles:
+        raise TooManyTiles(f"{len(ys)}x{len(xs)} tiles requested, the limit is {max_tiles}; "
+                           f"use a larger tile or less overlap.")
+    return pixels, [(y, x) for y in ys for x in xs], (len(ys), len(xs))
+
+
+def crop_tiles(pixels, positions, tile=IMAGE_SIZE):
+    """Cut the given tiles, each resized to the model input size."""
+    crops = []
+    for y, x in positions:
+        crop = pixels[y:y + tile, x:x + tile]
+        if tile != IMAGE_SIZE:
+            crop = np.asarray(Image.fromarray(crop).resize((IMAGE_SIZE, IMAGE_SIZE), Image.BILINEAR))
+        crops.append(crop)
+    return crops
+
+
+def normalize(crops):
+    batch = np.stack(crops).astype(np.float32) / 255.0
+    batch = (batch - MEAN.astype(np.float32)) / STD.astype(np.float32)
+    return np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+
+
+def classify_tiled(image_bytes, forward_fn, tile=IMAGE_SIZE, overlap=0.25, batch_size=16,
+                   max_side=MAX_SIDE, class_map=False, max_tiles=MAX_TILES):
+    """Classify overlapping tiles in batches and aggregate into one prediction.
+
+    forward_fn maps a (N, 3, 224, 224) float32 batch to (N, num_classes) probabilities.
+    The image-level score is the mean tile probability; the optional class
+    map holds each tile's top class on the tile grid. Grids above max_tiles
+    raise TooManyTiles.
+    """
+    img = decode_bounded(image_bytes, max_side=max_side)
+    pixels, positions, grid = make_tiles(img, tile, overlap, max_side, max_tiles)
+    probs = []
+    for start in range(0, len(positions), batch_size):
+        # only one batch of crops is ever held in memory
+        probs.append(forward_fn(normalize(crop_tiles(pixels, positions[start:start + batch_size], tile))))
+    probs = np.concatenate(probs)
+    mean = probs.mean(axis=0)
+    result = {
+        "probabilities": mean,
+        "tiles": len(positions),
+        "grid": grid,
+        "decoded_size": img.size,
+    }
+    if class_map:
+        result["class_map"] = np.argmax(probs, axis=1).reshape(grid)
+        result["tile_confidence"] = probs.max(axis=1).reshape(grid)
+    return result
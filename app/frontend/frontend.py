@@ -1,11 +1,12 @@
 import flet as ft
-import websockets
 import asyncio
-import base64
-import json
 import csv
 import os
-import requests
+import threading
+import time
+
+import local_inference as li
+import rock_client as rc
 
 # --- Rock Classes ---
 ROCK_CLASSES = [
@@ -67,22 +68,125 @@ def check_login(username, password):
             return user["isadmin"] == "1"
     return None
 
+# --- Paged user listing ---
+class UserStore:
+    """Byte offsets of every row in the users CSV, so any page is one seek away.
+
+    The index is kept between admin page visits and only extended when rows
+    are appended; searches remember their matching offsets until the file
+    changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = []
+        self.size = 0
+        self.mtime = None
+        self.searches = {}
+        self.lock = threading.Lock()
+
+    def _refresh(self):
+        ensure_db()
+        st = os.stat(self.path)
+        if (st.st_size, st.st_mtime_ns) == (self.size, self.mtime):
+            return
+        start = self.size if st.st_size > self.size and self.offsets else 0
+        if start == 0:
+            self.offsets = []
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            if start == 0:
+                f.readline()  # header
+            pos = f.tell()
+            for line in f:
+                if line.strip():
+                    self.offsets.append(pos)
+                pos += len(line)
+        self.size, self.mtime = st.st_size, st.st_mtime_ns
+        self.searches = {}
+
+    def _matches(self, query):
+        if not query:
+            return self.offsets
+        if query not in self.searches:
+            needle = query.encode("utf-8")
+            found = []
+            with open(self.path, "rb") as f:
+                pos = len(f.readline())  # header
+                for line in f:
+                    if needle in line.split(b",", 1)[0].lower():
+                        found.append(pos)
+                    pos += len(line)
+            if len(self.searches) >= 8:
+                self.searches.clear()
+            self.searches[query] = found
+        return self.searches[query]
+
+    def page(self, start, limit, query=""):
+        """(rows, total matching) for rows [start, start + limit) of the (filtered) listing."""
+        with self.lock:
+            self._refresh()
+            offsets = self._matches(query.strip().lower())
+            rows = []
+            with open(self.path, "rb") as f:
+                for offset in offsets[start:start + limit]:
+                    f.seek(offset)
+                    username, _, isadmin = next(csv.reader([f.readline().decode("utf-8")]))
+                    rows.append({"username": username, "isadmin": isadmin})
+            return rows, len(offsets)
+
+user_store = UserStore(DB_PATH)
+
 # --- Rock Prediction ---
+# ROCK_INFERENCE_MODE=local|remote|auto picks where classification runs; see local_inference.py
+LOCAL_MODEL = os.environ.get("ROCK_LOCAL_MODEL", li.DEFAULT_MODEL)
+REPROBE_SECONDS = 30
+inference_mode = None
+local_classifier = None
+last_probe = 0.0
+
+def resolve_inference_mode(force=False):
+    global inference_mode, local_classifier, last_probe
+    if inference_mode is None or force:
+        inference_mode = li.choose_mode(model_path=LOCAL_MODEL)
+        last_probe = time.monotonic()
+        if inference_mode == "local" and local_classifier is None:
+            # starts loading the model in the background straight away
+            local_classifier = li.LocalClassifier(LOCAL_MODEL)
+    return inference_mode
+
+def auto_mode():
+    return os.environ.get("ROCK_INFERENCE_MODE", "auto").lower() == "auto"
+
+# One pooled client for the whole app; a single retry keeps the fallback to local mode quick
+api = rc.RockClient("http://localhost:8000", retries=1)
+
+async def send_remote_prediction(image_path):
+    response = await asyncio.to_thread(api.predict, image_path, priority="interactive")
+    return {
+        "type": "prediction",
+        "class": response["class_name"],
+        "class_index": response["class"],
+        "confidence": response["confidence"]
+    }
+
 async def send_prediction_request(image_path):
-    with open(image_path, "rb") as image_file:
-        image_bytes = image_file.read()
-        image_data = base64.b64encode(image_bytes).decode("utf-8")
-
-    async with websockets.connect("ws://localhost:8000/ws") as websocket:
-        await websocket.send(json.dumps({
-            "type": "predict",
-            "data": image_data
-        }))
-        response = await websocket.recv()
-        return json.loads(response)
+    mode = resolve_inference_mode()
+    # in auto mode, go back to the backend once it comes up again
+    if mode == "local" and auto_mode() and time.monotonic() - last_probe > REPROBE_SECONDS:
+        mode = resolve_inference_mode(force=True)
+
+    if mode == "remote":
+        try:
+            return await send_remote_prediction(image_path)
+        except rc.RockConnectionError:
+            if not auto_mode() or resolve_inference_mode(force=True) != "local":
+                raise
+    return await asyncio.wrap_future(local_classifier.submit(image_path))
 
 # --- Main App ---
 def main(page: ft.Page):
+    resolve_inference_mode()
     page.title = "Rock Classification System"
     page.horizontal_alignment = "center"
     page.vertical_alignment = "center"
@@ -96,8 +200,66 @@ def main(page: ft.Page):
     # ----------------- Admin Page -----------------
     def show_admin_page(username):
         page.clean()
-        users = load_users()
-        user_list = "\n".join([f"{u['username']}  |  Admin: {u['isadmin']}" for u in users])
+        PAGE_SIZE = 100
+        # "search" is the latest typed query; it becomes "query" when a reset is applied
+        listing = {"query": "", "search": "", "loaded": 0, "total": 0, "reset": False}
+        listing_lock = threading.Lock()
+        user_count = ft.Text("", size=14)
+        user_list = ft.ListView(expand=True, item_extent=36, on_scroll_interval=50)
+
+        def user_row(user):
+            return ft.Container(
+                ft.Row([
+                    ft.Text(user["username"], size=14, expand=True),
+                    ft.Text("Admin" if user["isadmin"] == "1" else "", size=12, color=ft.Colors.AMBER_600)
+                ]),
+                height=36, padding=ft.padding.symmetric(horizontal=10)
+            )
+
+        def load_next_page(reset=False):
+            # Only the new rows and the counter are sent to the client, never the whole page.
+            # A reset requested while another load runs is left in listing["reset"]; whoever
+            # holds the lock re-checks it after releasing, so a search is never lost.
+            if reset:
+                listing["reset"] = True
+            while True:
+                if not listing_lock.acquire(blocking=False):
+                    return
+                try:
+                    if listing["reset"]:
+                        listing["reset"] = False
+                        listing["query"] = listing["search"]
+                        listing["loaded"] = 0
+                        user_list.controls.clear()
+                    rows, listing["total"] = user_store.page(listing["loaded"], PAGE_SIZE, listing["query"])
+                    listing["loaded"] += len(rows)
+                    user_list.controls.extend(user_row(u) for u in rows)
+                    user_count.value = f"Registered Users: {listing['total']}"
+                    user_list.update()
+                    user_count.update()
+                finally:
+                    listing_lock.release()
+                if not listing["reset"]:
+                    return
+
+        def on_scroll(e: ft.OnScrollEvent):
+            if e.pixels >= e.max_scroll_extent - 200 and listing["loaded"] < listing["total"]:
+                load_next_page()
+
+        user_list.on_scroll = on_scroll
+
+        search_timer = {"timer": None}
+
+        def on_search(e):
+            # wait for a pause in typing before searching
+            if search_timer["timer"]:
+                search_timer["timer"].cancel()
+            listing["search"] = e.control.value
+            search_timer["timer"] = threading.Timer(0.3, lambda: load_next_page(reset=True))
+            search_timer["timer"].start()
+
+        search_field = ft.TextField(label="Search users", prefix_icon=ft.Icons.SEARCH, width=420,
+                                    on_change=on_search)
 
         message = ft.Text("", color=ft.Colors.GREEN)
         file_picker = ft.FilePicker()
@@ -107,10 +269,8 @@ def main(page: ft.Page):
             if e.files:
                 ckpt_path = e.files[0].path
                 try:
-                    res = requests.post("http://localhost:8000/change_model", data={"ckpt_path": ckpt_path})
-                    r = res.json()
-                    message.value = r["message"]
-                    message.color = ft.Colors.GREEN if r["status"] == "success" else ft.Colors.RED
+                    message.value = api.change_model(ckpt_path)["message"]
+                    message.color = ft.Colors.GREEN
                 except Exception as ex:
                     message.value = f"Error: {ex}"
                     message.color = ft.Colors.RED
@@ -126,7 +286,7 @@ def main(page: ft.Page):
             on_click=lambda _: file_picker.pick_files(
                 allow_multiple=False, 
                 file_type=ft.FilePickerFileType.CUSTOM, 
-                allowed_extensions=["ckpt"]
+                allowed_extensions=["ckpt", "mindir"]
             )
         )
 
@@ -136,8 +296,9 @@ def main(page: ft.Page):
             ft.Column(
                 [
                     ft.Text(f"Welcome Admin {username}", size=22, weight=ft.FontWeight.BOLD),
-                    ft.Text("Registered Users:", size=16, weight=ft.FontWeight.NORMAL),
-                    ft.Text(user_list, size=14),
+                    search_field,
+                    user_count,
+                    ft.Container(user_list, width=420, height=320),
                     ft.Divider(),
                     change_model_btn,
                     message,
@@ -147,6 +308,7 @@ def main(page: ft.Page):
                 horizontal_alignment=ft.CrossAxisAlignment.CENTER,
             )
         )
+        load_next_page(reset=True)
 
     # ----------------- Classify Page -----------------
     def show_classify_page(username):
@@ -0,0 +1,124 @@
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue
+
+# The model code lives next to the backend; reuse it instead of copying it
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+DEFAULT_MODEL = os.path.join(BACKEND_DIR, "ckpt", "mobilenet_v2-25_74.ckpt")
+
+ROCK_CLASSES = [
+    "Basalt", "Chert", "Coal", "Gneiss", "Granite",
+    "Limestone", "Marble", "Obsidian", "Pumice",
+    "Sandstone", "Slate", "Travertine"
+]
+
+
+def backend_reachable(host="localhost", port=8000, timeout=0.3):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def local_available(model_path=DEFAULT_MODEL):
+    if not os.path.isfile(model_path):
+        return False
+    try:
+        import mindspore  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class LocalClassifier:
+    """Runs the model inside the desktop app on one background thread.
+
+    The model is loaded once, when the worker starts, and every request is
+    a plain function call on the worker: no base64, JSON or socket hop.
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL):
+        self.model_path = model_path
+        self.ready = threading.Event()
+        self.error = None
+        self._jobs = Queue()
+        self._thread = threading.Thread(target=self._run, name="local-inference", daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        if BACKEND_DIR not in sys.path:
+            sys.path.insert(0, BACKEND_DIR)
+        import mindspore as ms
+        from mindspore import Tensor, ops
+        from mindspore.train.serialization import load_checkpoint, load_param_into_net
+        import mobilenet_ms as mn
+        from preprocess import preprocess_array
+
+        if self.model_path.endswith(".mindir"):
+            net = ms.nn.GraphCell(ms.load(self.model_path))
+        else:
+            net = mn.mobilenet_v2_for_checkpoint(len(ROCK_CLASSES), self.model_path)
+            load_param_into_net(net, load_checkpoint(self.model_path))
+        net.set_train(False)
+        softmax = ops.Softmax()
+
+        def classify(image_bytes):
+            x = Tensor(preprocess_array(image_bytes), ms.float32)
+            return softmax(net(x)).asnumpy()[0]
+
+        # first call compiles kernels; do it now rather than on the user's first click
+        import numpy as np
+        softmax(net(Tensor(np.zeros((1, 3, 224, 224), dtype=np.float32)))).asnumpy()
+        return classify
+
+    def _run(self):
+        try:
+            classify = self._load()
+        except Exception as e:
+            self.error = e
+            self.ready.set()
+            while True:
+                _, future = self._jobs.get()
+                future.set_exception(RuntimeError(f"Local model failed to load: {e}"))
+        self.ready.set()
+        while True:
+            image_path, future = self._jobs.get()
+            try:
+                start = time.perf_counter()
+                with open(image_path, "rb") as f:
+                    probabilities = classify(f.read())
+                predicted_class = int(probabilities.argmax())
+                future.set_result({
+                    "type": "prediction",
+                    "class": ROCK_CLASSES[predicted_class],
+                    "class_index": predicted_class,
+                    "confidence": float(probabilities[predicted_class]),
+                    "elapsed_ms": (time.perf_counter() - start) * 1000,
+                    "mode": "local"
+                })
+            except Exception as e:
+                future.set_exception(e)
+
+    def submit(self, image_path):
+        future = Future()
+        self._jobs.put((image_path, future))
+        return future
+
+
+def choose_mode(setting=None, model_path=DEFAULT_MODEL):
+    """'local' or 'remote' from ROCK_INFERENCE_MODE (local | remote | auto).
+
+    auto uses the backend when it answers on localhost:8000 and falls back
+    to the in-process model when it does not.
+    """
+    setting = (setting or os.environ.get("ROCK_INFERENCE_MODE", "auto")).lower()
+    if setting in ("local", "remote"):
+        return setting
+    if backend_reachable():
+        return "remote"
+    return "local" if local_available(model_path) else "remote"
@@ -0,0 +1,298 @@
+"""Client library for the rock classification backend.
+
+    from rock_client import RockClient
+
+    with RockClient("http://localhost:8000") as client:
+        print(client.predict("Rock Test/rock01.jpg"))
+        for path, result in client.predict_dir("Rock Test"):
+            print(path, result)
+
+AsyncRockClient has the same methods as coroutines (predict_many and
+predict_dir are async generators).
+"""
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+# Worth retrying: router without a healthy backend, backend shedding load, gateway timeouts
+RETRY_STATUS = {502, 503, 504}
+# The backend's MAX_BATCH_FILES: larger /predict_batch requests are refused
+MAX_BATCH_SIZE = 64
+
+
+class RockClientError(Exception):
+    pass
+
+
+class RockConnectionError(RockClientError):
+    """The backend could not be reached, even after retrying."""
+
+
+def iter_images(directory, recursive=True):
+    """Image paths under a directory, in sorted order, without listing everything up front."""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+        if not recursive:
+            break
+
+
+def _read(image):
+    """(filename, bytes) from a path or raw bytes."""
+    if isinstance(image, (bytes, bytearray)):
+        return "image", bytes(image)
+    with open(image, "rb") as f:
+        return os.path.basename(str(image)), f.read()
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _backoff(attempt, base):
+    # exponential with jitter so many clients don't retry in lockstep
+    return base * (2 ** attempt) * (0.5 + random.random() / 2)
+
+
+def _parse(response):
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        raise RockClientError(f"{response.request.method} {response.request.url.path}: "
+                              f"HTTP {response.status_code}") from e
+    data = response.json()
+    if isinstance(data, dict) and data.get("status") == "error":
+        raise RockClientError(data.get("message", "Request failed."))
+    return data
+
+
+def _headers(client_id, admin_token):
+    headers = {}
+    if client_id:
+        headers["X-Client-Id"] = client_id
+    if admin_token:
+        headers["X-Admin-Token"] = admin_token
+    return headers
+
+
+def _batch_files(images):
+    """Multipart files for the readable images, and error entries by position for the rest."""
+    files, errors = [], {}
+    for i, image in enumerate(images):
+        try:
+            name, data = _read(image)
+        except OSError as e:
+            # a missing or unreadable file is one bad image, not a failed batch
+            errors[i] = {"status": "error", "message": f"Cannot read {image}: {e.strerror or e}"}
+            continue
+        files.append(("files", (name, data, "application/octet-stream")))
+    return files, errors
+
+
+def _merge(results, errors):
+    """Put the read errors back between the server's results, in input order."""
+    remaining = iter(results)
+    return [errors[i] if i in errors else next(remaining) for i in range(len(results) + len(errors))]
+
+
+class RockClient:
+    """Synchronous client with pooled keep-alive connections and retries.
+
+    predict_many() sends images in batches of batch_size (at most
+    MAX_BATCH_SIZE) to /predict_batch, keeps at most `concurrency` batches
+    in flight and yields results in input order as they arrive, so
+    directory-sized jobs never hold more than concurrency * batch_size
+    images in memory. A failed batch yields error entries, not an exception.
+    """
+
+    def __init__(self, base_url="http://localhost:8000", client_id=None, admin_token=None, timeout=30.0,
+                 max_connections=8, retries=3, backoff=0.25, batch_size=16, concurrency=4):
+        self.retries = retries
+        self.backoff = backoff
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.concurrency = concurrency
+        self._http = httpx.Client(base_url=base_url, timeout=timeout, headers=_headers(client_id, admin_token),
+                                  limits=httpx.Limits(max_connections=max_connections,
+                                                      max_keepalive_connections=max_connections))
+
+    def _request(self, method, path, **kwargs):
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._http.request(method, path, **kwargs)
+                if response.status_code not in RETRY_STATUS:
+                    return _parse(response)
+                error = RockClientError(f"{method} {path}: HTTP {response.status_code}")
+            except httpx.TransportError as e:
+                error = RockConnectionError(f"{method} {path}: {e}")
+            if attempt == self.retries:
+                raise error
+            time.sleep(_backoff(attempt, self.backoff))
+
+    def predict(self, image, priority="normal", explain=False, deadline_ms=None):
+        name, data = _read(image)
+        form = {"priority": priority, "explain": str(explain).lower()}
+        if deadline_ms is not None:
+            form["deadline_ms"] = str(deadline_ms)
+        return self._request("POST", "/predict", files={"file": (name, data)}, data=form)
+
+    def predict_batch(self, images, priority="bulk"):
+        """One /predict_batch request; bad or unreadable images get {"status": "error"} entries."""
+        files, errors = _batch_files(images)
+        results = self._request("POST", "/predict_batch", files=files,
+                                data={"priority": priority})["results"] if files else []
+        return _merge(results, errors)
+
+    def predict_many(self, images, batch_size=None, concurrency=None, priority="bulk"):
+        """Yield (image, result) for an iterable of paths or bytes, in input order."""
+        batch_size = min(batch_size or self.batch_size, MAX_BATCH_SIZE)
+        concurrency = concurrency or self.concurrency
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            pending = deque()
+            for batch in _chunks(images, batch_size):
+                if len(pending) >= concurrency:
+                    yield from self._collect(*pending.popleft())
+                pending.append((batch, pool.submit(self.predict_batch, batch, priority)))
+            while pending:
+                yield from self._collect(*pending.popleft())
+
+    @staticmethod
+    def _collect(batch, future):
+        try:
+            results = future.result()
+        except RockClientError as e:
+            # one failed batch should not end a long job
+            results = [{"status": "error", "message": str(e)}] * len(batch)
+        yield from zip(batch, results)
+
+    def predict_dir(self, directory, recursive=True, **kwargs):
+        return self.predict_many(iter_images(directory, recursive), **kwargs)
+
+    def similar(self, image, k=5):
+        name, data = _read(image)
+        return self._request("POST", "/similar", files={"file": (name, data)}, data={"k": str(k)})
+
+    def explain(self, request_id, class_name=None, versus=None):
+        params = {k: v for k, v in (("class_name", class_name), ("versus", versus)) if v}
+        return self._request("GET", f"/explain/{request_id}", params=params)
+
+    def change_model(self, ckpt_path):
+        return self._request("POST", "/change_model", data={"ckpt_path": ckpt_path})
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def close(self):
+        self._http.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncRockClient:
+    """asyncio version of RockClient; create it inside the event loop that uses it."""
+
+    def __init__(self, base_url="http://localhost:8000", client_id=None, admin_token=None, timeout=30.0,
+                 max_connections=8, retries=3, backoff=0.25, batch_size=16, concurrency=4):
+        self.retries = retries
+        self.backoff = backoff
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.concurrency = concurrency
+        self._http = httpx.AsyncClient(base_url=base_url, timeout=timeout, headers=_headers(client_id, admin_token),
+                                       limits=httpx.Limits(max_connections=max_connections,
+                                                           max_keepalive_connections=max_connections))
+
+    async def _request(self, method, path, **kwargs):
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self._http.request(method, path, **kwargs)
+                if response.status_code not in RETRY_STATUS:
+                    return _parse(response)
+                error = RockClientError(f"{method} {path}: HTTP {response.status_code}")
+            except httpx.TransportError as e:
+                error = RockConnectionError(f"{method} {path}: {e}")
+            if attempt == self.retries:
+                raise error
+            await asyncio.sleep(_backoff(attempt, self.backoff))
+
+    async def predict(self, image, priority="normal", explain=False, deadline_ms=None):
+        name, data = await asyncio.to_thread(_read, image)
+        form = {"priority": priority, "explain": str(explain).lower()}
+        if deadline_ms is not None:
+            form["deadline_ms"] = str(deadline_ms)
+        return await self._request("POST", "/predict", files={"file": (name, data)}, data=form)
+
+    async def predict_batch(self, images, priority="bulk"):
+        files, errors = await asyncio.to_thread(_batch_files, images)
+        results = (await self._request("POST", "/predict_batch", files=files,
+                                       data={"priority": priority}))["results"] if files else []
+        return _merge(results, errors)
+
+    async def predict_many(self, images, batch_size=None, concurrency=None, priority="bulk"):
+        """Async generator of (image, result), in input order, with bounded batches in flight."""
+        batch_size = min(batch_size or self.batch_size, MAX_BATCH_SIZE)
+        concurrency = concurrency or self.concurrency
+        pending = deque()
+        try:
+            for batch in _chunks(images, batch_size):
+                if len(pending) >= concurrency:
+                    for item in await self._collect(*pending.popleft()):
+                        yield item
+                pending.append((batch, asyncio.ensure_future(self.predict_batch(batch, priority))))
+            while pending:
+                for item in await self._collect(*pending.popleft()):
+                    yield item
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    @staticmethod
+    async def _collect(batch, task):
+        try:
+            results = await task
+        except RockClientError as e:
+            results = [{"status": "error", "message": str(e)}] * len(batch)
+        return list(zip(batch, results))
+
+    def predict_dir(self, directory, recursive=True, **kwargs):
+        return self.predict_many(iter_images(directory, recursive), **kwargs)
+
+    async def similar(self, image, k=5):
+        name, data = await asyncio.to_thread(_read, image)
+        return await self._request("POST", "/similar", files={"file": (name, data)}, data={"k": str(k)})
+
+    async def explain(self, request_id, class_name=None, versus=None):
+        params = {k: v for k, v in (("class_name", class_name), ("versus", versus)) if v}
+        return await self._request("GET", f"/explain/{request_id}", params=params)
+
+    async def change_model(self, ckpt_path):
+        return await self._request("POST", "/change_model", data={"ckpt_path": ckpt_path})
+
+    async def health(self):
+        return await self._request("GET", "/health")
+
+    async def close(self):
+        await self._http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -0,0 +1,289 @@
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+# Images are stored once as uint8 with the short side resized to CACHE_SIZE and
+# the full frame kept: the validation pipeline (Resize(256) + CenterCrop(224))
+# sees exactly this, and random crops still cover the whole photo as
+# RandomCropDecodeResize does (only at this resolution instead of the original).
+CACHE_SIZE = 256
+# Bumped whenever the stored layout changes, so older caches are rebuilt
+CACHE_VERSION = 2
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def _fingerprint(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def scan_folder(data_path, class_indexing):
+    """Return sorted [(path, label)] for an ImageFolder tree limited to class_indexing."""
+    items = []
+    for class_name, label in sorted(class_indexing.items(), key=lambda kv: kv[1]):
+        class_dir = os.path.join(data_path, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        for name in sorted(os.listdir(class_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                items.append((os.path.join(class_dir, name), label))
+    return items
+
+
+def resized_shape(width, height, size=CACHE_SIZE):
+    """(h, w, 3) of an image once its short side is resized to `size`."""
+    scale = size / min(width, height)
+    return max(size, round(height * scale)), max(size, round(width * scale)), 3
+
+
+def decode_resize(path, size=CACHE_SIZE):
+    img = Image.open(path).convert("RGB")
+    h, w, _ = resized_shape(*img.size, size)
+    return np.asarray(img.resize((w, h), Image.BILINEAR), dtype=np.uint8)
+
+
+def _shape_job(args):
+    # header only, nothing is decoded
+    path, size = args
+    with Image.open(path) as img:
+        return resized_shape(*img.size, size)
+
+
+def _decode_job(args):
+    path, size = args
+    return decode_resize(path, size)
+
+
+class ImageCache:
+    """Pre-decoded, pre-resized uint8 copy of an ImageFolder split.
+
+    Images keep their aspect ratio, so they are packed back to back:
+        images.npy     flat uint8 buffer of every image, memory-mappable
+        offsets.npy    (N + 1,) int64 start of each image in images.npy
+        shapes.npy     (N, 3) int32 (h, w, 3) of each image
+        labels.npy     (N,) int32 labels from class_indexing
+        manifest.json  source paths and their (size, mtime) fingerprints
+    """
+
+    def __init__(self, data_path, cache_dir, class_indexing, size=CACHE_SIZE):
+        self.data_path = data_path
+        self.cache_dir = cache_dir
+        self.class_indexing = class_indexing
+        self.size = size
+
+    @property
+    def images_path(self):
+        return os.path.join(self.cache_dir, "images.npy")
+
+    @property
+    def labels_path(self):
+        return os.path.join(self.cache_dir, "labels.npy")
+
+    @property
+    def offsets_path(self):
+        return os.path.join(self.cache_dir, "offsets.npy")
+
+    @property
+    def shapes_path(self):
+        return os.path.join(self.cache_dir, "shapes.npy")
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.cache_dir, "manifest.json")
+
+    def _load_manifest(self):
+        if not os.path.isfile(self.manifest_path) or not os.path.isfile(self.images_path):
+            return None
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return manifest if manifest.get("version") == CACHE_VERSION else None
+
+    def is_valid(self, items=None):
+        manifest = self._load_manifest()
+        if manifest is None:
+            return False
+        if manifest["size"] != self.size or manifest["class_indexing"] != self.class_indexing:
+            return False
+        items = items if items is not None else scan_folder(self.data_path, self.class_indexing)
+        if [p for p, _ in items] != [e["path"] for e in manifest["entries"]]:
+            return False
+        return all(e["fingerprint"] == _fingerprint(e["path"]) for e in manifest["entries"])
+
+    def build(self, num_workers=8, force=False):
+        """Create or refresh the cache. Unchanged images are copied from the old cache."""
+        items = scan_folder(self.data_path, self.class_indexing)
+        if not force and self.is_valid(items):
+            return False
+
+        reuse = {}
+        manifest = None if force else self._load_manifest()
+        if manifest is not None and manifest["size"] == self.size:
+            old_images = np.load(self.images_path, mmap_mode="r")
+            old_offsets = np.load(self.offsets_path)
+            for row, e in enumerate(manifest["entries"]):
+                if os.path.isfile(e["path"]) and e["fingerprint"] == _fingerprint(e["path"]):
+                    reuse[e["path"]] = row
+        else:
+            old_images = old_offsets = None
+
+        todo = [i for i, (p, _) in enumerate(items) if p not in reuse]
+        shapes = np.zeros((len(items), 3), dtype=np.int32)
+        for i, (p, _) in enumerate(items):
+            if p in reuse:
+                shapes[i] = manifest["entries"][reuse[p]]["shape"]
+        if todo:
+            with Pool(num_workers) as pool:
+                shapes[todo] = pool.map(_shape_job, [(items[i][0], self.size) for i in todo], chunksize=32)
+        offsets = np.zeros(len(items) + 1, dtype=np.int64)
+        np.cumsum(np.prod(shapes, axis=1, dtype=np.int64), out=offsets[1:])
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_images = self.images_path + ".tmp.npy"
+        images = np.lib.format.open_memmap(tmp_images, mode="w+", dtype=np.uint8, shape=(max(int(offsets[-1]), 1),))
+        for i, (p, _) in enumerate(items):
+            if p in reuse:
+                row = reuse[p]
+                images[offsets[i]:offsets[i + 1]] = old_images[old_offsets[row]:old_offsets[row + 1]]
+
+        if todo:
+            with Pool(num_workers) as pool:
+                jobs = [(items[i][0], self.size) for i in todo]
+                for i, arr in zip(todo, pool.imap(_decode_job, jobs, chunksize=8)):
+                    images[offsets[i]:offsets[i + 1]] = arr.ravel()
+        images.flush()
+        del images, old_images
+
+        os.replace(tmp_images, self.images_path)
+        np.save(self.offsets_path, offsets)
+        np.save(self.shapes_path, shapes)
+        np.save(self.labels_path, np.array([l for _, l in items], dtype=np.int32))
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": CACHE_VERSION,
+                "size": self.size,
+                "class_indexing": self.class_indexing,
+                "entries": [{"path": p, "label": l, "fingerprint": _fingerprint(p), "shape": shape.tolist()}
+                            for (p, l), shape in zip(items, shapes)],
+            }, f)
+        print(f"Cached {len(items)} images to {self.cache_dir} "
+              f"({len(todo)} decoded, {len(items) - len(todo)} reused)")
+        return True
+
+
+class CachedImageSource:
+    """Random-access source for ds.GeneratorDataset backed by the memmapped cache."""
+
+    def __init__(self, cache):
+        self.images_path = cache.images_path
+        self.offsets = np.load(cache.offsets_path)
+        self.shapes = np.load(cache.shapes_path)
+        self.labels = np.load(cache.labels_path)
+        self._images = None
+
+    def __getstate__(self):
+        # never pickle the mapped array into worker processes; each reopens it
+        state = self.__dict__.copy()
+        state["_images"] = None
+        return state
+
+    def __getitem__(self, index):
+        if self._images is None:
+            self._images = np.load(self.images_path, mmap_mode="r")
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return np.array(self._images[start:end]).reshape(self.shapes[index]), self.labels[index]
+
+    def __len__(self):
+        return len(self.labels)
+
+
+def create_cached_dataset(data_path, class_indexing, batch_size=32, training=True,
+                          cache_root=".cache", num_parallel_workers=8):
+    """Drop-in replacement for create_dataset that reads from the decoded cache."""
+    import mindspore.dataset as ds
+    import mindspore.dataset.vision.c_transforms as CV
+
+    cache = ImageCache(data_path, os.path.join(cache_root, os.path.basename(os.path.normpath(data_path))),
+                       class_indexing)
+    cache.build(num_workers=num_parallel_workers)
+
+    data_set = ds.GeneratorDataset(CachedImageSource(cache), column_names=["image", "label"],
+                                   shuffle=True, num_parallel_workers=num_parallel_workers)
+
+    image_size = 224
+    mean = [0.485 * 255, 0.456 * 255, 0.406 * 255]
+    std = [0.229 * 255, 0.224 * 255, 0.225 * 255]
+
+    # Augmentations still run on the fly, only decoding is skipped
+    if training:
+        trans = [
+            CV.RandomResizedCrop(image_size, scale=(0.08, 1.0), ratio=(0.75, 1.333)),
+            CV.RandomHorizontalFlip(prob=0.5),
+            CV.Normalize(mean=mean, std=std),
+            CV.HWC2CHW()
+        ]
+    else:
+        trans = [
+            CV.CenterCrop(image_size),
+            CV.Normalize(mean=mean, std=std),
+            CV.HWC2CHW()
+        ]
+
+    data_set = data_set.map(operations=trans, input_columns="image", num_parallel_workers=num_parallel_workers)
+    data_set = data_set.batch(batch_size, drop_remainder=True)
+    return data_set
+
+
+def time_epoch(data_set):
+    start = time.perf_counter()
+    batches = 0
+    for _ in data_set.create_tuple_iterator(output_numpy=True, num_epochs=1):
+        batches += 1
+    return time.perf_counter() - start, batches
+
+
+def benchmark(data_path, class_indexing, epochs=3):
+    """Compare epoch time of the decoding ImageFolderDataset pipeline against the cache."""
+    import mindspore.dataset as ds
+    import mindspore.dataset.vision.c_transforms as CV
+
+    mean = [0.485 * 255, 0.456 * 255, 0.406 * 255]
+    std = [0.229 * 255, 0.224 * 255, 0.225 * 255]
+    raw = ds.ImageFolderDataset(data_path, num_parallel_workers=8, shuffle=True,
+                                class_indexing=class_indexing)
+    raw = raw.map(operations=[
+        CV.RandomCropDecodeResize(224, scale=(0.08, 1.0), ratio=(0.75, 1.333)),
+        CV.RandomHorizontalFlip(prob=0.5),
+        CV.Normalize(mean=mean, std=std),
+        CV.HWC2CHW()
+    ], input_columns="image", num_parallel_workers=8).batch(32, drop_remainder=True)
+
+    start = time.perf_counter()
+    cached = create_cached_dataset(data_path, class_indexing, training=True)
+    print(f"Cache ready in {time.perf_counter() - start:.2f}s")
+
+    for name, data_set in (("decode every epoch", raw), ("decoded cache", cached)):
+        times = [time_epoch(data_set)[0] for _ in range(epochs)]
+        print(f"{name:<20} epoch time: {np.mean(times):.2f}s (min {min(times):.2f}s over {epochs} epochs)")
+
+
+if __name__ == "__main__":
+    # python image_cache.py build rocks_train rocks_val
+    # python image_cache.py bench rocks_train
+    rock_classes = ["Basalt", "Chert", "Coal", "Gneiss", "Granite",
+                    "Limestone", "Marble", "Obsidian", "Pumice",
+                    "Sandstone", "Slate", "Travertine"]
+    class_indexing = {name: idx for idx, name in enumerate(rock_classes)}
+
+    if len(sys.argv) >= 3 and sys.argv[1] == "build":
+        for path in sys.argv[2:]:
+            ImageCache(path, os.path.join(".cache", os.path.basename(os.path.normpath(path))),
+                       class_indexing).build()
+    elif len(sys.argv) >= 3 and sys.argv[1] == "bench":
+        benchmark(sys.argv[2], class_indexing)
+    else:
+        print("Usage: python image_cache.py build <folder>... | bench <folder>")
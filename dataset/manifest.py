@@ -0,0 +1,191 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp")
+HASH_BITS = 64
+BANDS = 4  # pigeonhole: hashes within BANDS-1 bits share at least one band
+
+
+def _fingerprint(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def dhash(img, size=8):
+    """64-bit difference hash: compares neighbouring pixels of a 9x8 greyscale thumbnail."""
+    small = img.convert("L").resize((size + 1, size), Image.BILINEAR)
+    px = small.tobytes()
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = px[row * (size + 1) + col]
+            right = px[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def scan_file(path):
+    """Hash and measure one image. Runs inside a worker process."""
+    record = {"fingerprint": _fingerprint(path)}
+    with open(path, "rb") as f:
+        data = f.read()
+    record["sha256"] = hashlib.sha256(data).hexdigest()
+    try:
+        with Image.open(path) as img:
+            img.verify()
+        # verify() leaves the file unusable, so reopen to actually decode pixels
+        with Image.open(path) as img:
+            img.load()
+            record["width"], record["height"] = img.size
+            record["mode"] = img.mode
+            record["phash"] = format(dhash(img), "016x")
+        record["error"] = None
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    return path, record
+
+
+def list_split(root, split):
+    split_dir = os.path.join(root, split)
+    for label in sorted(os.listdir(split_dir)):
+        class_dir = os.path.join(split_dir, label)
+        if not os.path.isdir(class_dir):
+            continue
+        for name in sorted(os.listdir(class_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(class_dir, name), label
+
+
+def build_manifest(root, splits, manifest_path, workers=None):
+    """Scan every split, reusing manifest records whose fingerprint is unchanged."""
+    old = {}
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            old = json.load(f).get("files", {})
+
+    files = {}
+    todo = []
+    for split in splits:
+        for path, label in list_split(root, split):
+            rel = os.path.relpath(path, root)
+            prev = old.get(rel)
+            if prev is not None and prev["fingerprint"] == _fingerprint(path):
+                files[rel] = prev
+            else:
+                todo.append((rel, path, split, label))
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            paths = [path for _, path, _, _ in todo]
+            for (rel, _, split, label), (_, record) in zip(todo, pool.map(scan_file, paths, chunksize=16)):
+                record["split"] = split
+                record["label"] = label
+                files[rel] = record
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"root": root, "splits": list(splits), "files": files}, f, indent=1, sort_keys=True)
+    return files, len(todo)
+
+
+# --- Analysis ---
+def exact_duplicates(files):
+    groups = defaultdict(list)
+    for rel, r in files.items():
+        groups[r["sha256"]].append(rel)
+    return [sorted(g) for g in groups.values() if len(g) > 1]
+
+
+def near_duplicates(files, max_distance=BANDS - 1):
+    """Pairs of distinct files whose perceptual hashes differ by <= max_distance bits.
+
+    Hashes are bucketed by 16-bit band so only files sharing a band are compared,
+    which keeps this close to linear for real datasets.
+    """
+    band_bits = HASH_BITS // BANDS
+    mask = (1 << band_bits) - 1
+    hashes = {rel: int(r["phash"], 16) for rel, r in files.items() if r.get("phash")}
+    buckets = defaultdict(list)
+    for rel, h in hashes.items():
+        for b in range(BANDS):
+            buckets[(b, (h >> (b * band_bits)) & mask)].append(rel)
+
+    pairs = {}
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for i in range(len(members)):
+            for j in range(i + 1, len(members)):
+                a, b = sorted((members[i], members[j]))
+                if (a, b) in pairs or files[a]["sha256"] == files[b]["sha256"]:
+                    continue
+                d = bin(hashes[a] ^ hashes[b]).count("1")
+                if d <= max_distance:
+                    pairs[(a, b)] = d
+    return sorted((a, b, d) for (a, b), d in pairs.items())
+
+
+def report(files, max_distance):
+    unreadable = sorted((rel, r["error"]) for rel, r in files.items() if r.get("error"))
+    dupes = exact_duplicates(files)
+    near = near_duplicates(files, max_distance)
+
+    def crosses(group):
+        return len({files[rel]["split"] for rel in group}) > 1
+
+    def mislabelled(group):
+        return len({files[rel]["label"] for rel in group}) > 1
+
+    print(f"\n{len(files)} images scanned")
+    print(f"\nUnreadable files: {len(unreadable)}")
+    for rel, err in unreadable:
+        print(f"  {rel}: {err}")
+
+    print(f"\nExact duplicate groups: {len(dupes)}")
+    for g in dupes:
+        tags = []
+        if crosses(g):
+            tags.append("LEAK")
+        if mislabelled(g):
+            tags.append("LABEL CONFLICT")
+        print(f"  {' | '.join(g)}  {' '.join(tags)}")
+
+    leaks = [(a, b, d) for a, b, d in near if crosses((a, b))]
+    print(f"\nNear-duplicates (<= {max_distance} bits): {len(near)}, crossing splits: {len(leaks)}")
+    for a, b, d in near:
+        tags = []
+        if crosses((a, b)):
+            tags.append("LEAK")
+        if mislabelled((a, b)):
+            tags.append("LABEL CONFLICT")
+        print(f"  {a} ~ {b} ({d} bits)  {' '.join(tags)}")
+
+    exact_leaks = sum(1 for g in dupes if crosses(g))
+    print(f"\nTrain/val leakage: {exact_leaks} exact groups, {len(leaks)} near-duplicate pairs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan the rock dataset for corrupt, duplicate and leaking images.")
+    parser.add_argument("--root", default=".", help="folder containing the split folders")
+    parser.add_argument("--splits", nargs="+", default=["rocks_train", "rocks_val"])
+    parser.add_argument("--manifest", default="manifest.json")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-distance", type=int, default=BANDS - 1,
+                        help=f"near-duplicate threshold in bits (exhaustive up to {BANDS - 1})")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    files, scanned = build_manifest(args.root, args.splits, args.manifest, args.workers)
+    print(f"Manifest {args.manifest}: {scanned} files scanned, "
+          f"{len(files) - scanned} reused in {time.perf_counter() - start:.2f}s")
+    report(files, args.max_distance)
+
+
+if __name__ == "__main__":
+    main()